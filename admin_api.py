@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存管理API路由模块
+查看K线缓存中的股票（大小、数据年龄、命中次数）和热点股票，按股票或板块使缓存失效，批量预热
+"""
+
+import hmac
+import os
+from flask import request, jsonify
+from stock_data import (API_CONFIG, get_background_refresh_stats, get_daily_cache_stats,
+                        get_data_provider_stats, get_hot_daily_cache_keys, list_daily_cache_entries)
+
+# 管理接口配置
+ADMIN_CONFIG = {
+    'token': os.environ.get('ADMIN_TOKEN'),  # 设置后请求需携带 X-Admin-Token 请求头；未设置时只允许本机访问
+    'loopback_addrs': ('127.0.0.1', '::1'),
+    'list_limit': 500,   # 缓存条目列表默认返回的数量
+    'hot_limit': 20,     # 热点股票默认返回的数量
+    'max_symbols': 6000  # 单次失效/预热的股票数量上限
+}
+
+
+def _params():
+    """合并查询参数和JSON请求体"""
+    params = dict(request.args)
+    if request.is_json:
+        params.update(request.get_json(silent=True) or {})
+    return params
+
+
+def _resolve_ts_codes(cache, params):
+    """
+    解析codes（逗号分隔字符串或列表）或board参数为TS代码列表
+    返回(代码列表, 错误信息)
+    """
+    codes = params.get('codes') or []
+    if isinstance(codes, str):
+        codes = codes.split(',')
+    codes = [str(code).strip() for code in codes if str(code).strip()]
+    board = str(params.get('board') or '').strip()
+
+    if codes:
+        ts_codes = []
+        for code in codes:
+            ts_code = cache.get_stock_ts_code(code)
+            if not ts_code:
+                return None, f'未找到股票代码: {code}'
+            ts_codes.append(ts_code)
+    elif board:
+        ts_codes = cache.get_board_ts_codes(board)
+        if not ts_codes:
+            return None, f'未找到板块: {board}'
+    else:
+        return None, '需要指定codes或board参数'
+
+    ts_codes = list(dict.fromkeys(ts_codes))
+    if len(ts_codes) > ADMIN_CONFIG['max_symbols']:
+        return None, f"单次最多操作 {ADMIN_CONFIG['max_symbols']} 只股票"
+    return ts_codes, None
+
+
+def check_admin_request():
+    """
+    校验管理类请求: 配置了管理令牌时比对X-Admin-Token请求头，未配置时只允许本机地址访问
+    通过时返回None，否则返回403错误响应
+    """
+    token = ADMIN_CONFIG['token']
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+    else:
+        allowed = request.remote_addr in ADMIN_CONFIG['loopback_addrs']
+    if allowed:
+        return None
+    error_response = jsonify({'error': '管理令牌无效' if token else '未配置ADMIN_TOKEN，管理接口只允许本机访问'})
+    error_response.headers.add('Access-Control-Allow-Origin', '*')
+    return error_response, 403
+
+
+def _truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def setup_admin_routes(app, cache):
+    """设置缓存管理相关的API路由"""
+
+    @app.before_request
+    def check_admin_token():
+        """校验管理接口的访问权限"""
+        if not request.path.startswith('/api/admin/') or request.method == 'OPTIONS':
+            return None
+        return check_admin_request()
+
+    @app.route('/api/admin/cache', methods=['GET', 'OPTIONS'])
+    def list_cache():
+        """缓存概况和已缓存股票列表"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            sort_by = request.args.get('sort', 'size')
+            limit = request.args.get('limit', ADMIN_CONFIG['list_limit'], type=int)
+            response = jsonify({
+                'stats': get_daily_cache_stats(),
+                'encoded_bodies': {'hits': cache.encoded_bodies.hits,
+                                   'misses': cache.encoded_bodies.misses},
+                'refresher': get_background_refresh_stats(),
+                'providers': get_data_provider_stats(),
+                'entries': list_daily_cache_entries(sort_by, limit)
+            })
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+
+        except Exception as e:
+            print(f"获取缓存列表失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/admin/cache/hot', methods=['GET', 'OPTIONS'])
+    def hot_keys():
+        """访问频率最高的已缓存股票"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            n = request.args.get('n', ADMIN_CONFIG['hot_limit'], type=int)
+            response = jsonify({'hot': get_hot_daily_cache_keys(n)})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+
+        except Exception as e:
+            print(f"获取热点股票失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/admin/cache/invalidate', methods=['POST', 'OPTIONS'])
+    def invalidate_cache():
+        """按股票或板块使K线缓存失效，下次请求从数据源完整回补；purge=1时同时删除磁盘存储"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            params = _params()
+            ts_codes, error = _resolve_ts_codes(cache, params)
+            if error:
+                return jsonify({'error': error}), 400
+
+            result = cache.invalidate_daily_data(ts_codes, drop_store=_truthy(params.get('purge')))
+            result['requested'] = len(ts_codes)
+            response = jsonify(result)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+
+        except Exception as e:
+            print(f"缓存失效失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/admin/cache/warm', methods=['POST', 'OPTIONS'])
+    def warm_cache():
+        """在后台批量预热股票的K线缓存"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            params = _params()
+            ts_codes, error = _resolve_ts_codes(cache, params)
+            if error:
+                return jsonify({'error': error}), 400
+
+            days = int(params.get('days') or API_CONFIG['default_days'])
+            result = cache.warm_daily_data(ts_codes, days)
+            result['requested'] = len(ts_codes)
+            response = jsonify(result)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 202
+
+        except Exception as e:
+            print(f"缓存预热失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    print("缓存管理API路由设置完成")
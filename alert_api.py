@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情提醒API路由模块
+管理服务端提醒规则，通过SSE推送触发的提醒，并提供按ID增量拉取最近提醒的接口；
+规则可以配置webhook地址，所有接口与缓存管理接口一样需要管理权限
+"""
+
+import json
+import queue
+from datetime import datetime
+from flask import Response, request, jsonify, stream_with_context
+from admin_api import check_admin_request
+
+# SSE配置
+SSE_CONFIG = {
+    'heartbeat_seconds': 15  # 无提醒时发送心跳注释的间隔，防止代理断开连接
+}
+
+
+def setup_alert_routes(app, cache):
+    """设置行情提醒相关的API路由"""
+
+    @app.before_request
+    def check_alert_access():
+        """提醒接口使用与缓存管理接口相同的访问校验"""
+        if not request.path.startswith('/api/alerts/') or request.method == 'OPTIONS':
+            return None
+        return check_admin_request()
+
+    @app.route('/api/alerts/rules', methods=['GET', 'POST', 'OPTIONS'])
+    def alert_rules():
+        """GET: 列出提醒规则（可按code筛选）；POST: 添加提醒规则"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            if request.method == 'GET':
+                ts_code = None
+                code = request.args.get('code', '').strip()
+                if code:
+                    ts_code = cache.get_stock_ts_code(code)
+                    if not ts_code:
+                        return jsonify({'error': f'未找到股票代码: {code}'}), 404
+                response = jsonify({'rules': cache.alerts.list_rules(ts_code), 'stats': cache.alerts.stats()})
+                response.headers.add('Access-Control-Allow-Origin', '*')
+                return response
+
+            params = dict(request.args)
+            if request.is_json:
+                params.update(request.get_json(silent=True) or {})
+
+            code = str(params.get('code', '')).strip()
+            ts_code = cache.get_stock_ts_code(code) if code else None
+            if not ts_code:
+                return jsonify({'error': f'未找到股票代码: {code}'}), 404
+
+            try:
+                threshold = float(params.get('threshold', 0))
+                threshold2 = params.get('threshold2')
+                threshold2 = float(threshold2) if threshold2 not in (None, '') else None
+                window = int(params.get('window') or 0)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'threshold/threshold2/window参数无效'}), 400
+
+            rule = cache.alerts.add_rule(ts_code, str(params.get('type', '')), threshold, threshold2, window,
+                                         params.get('webhook') or None,
+                                         str(params.get('once', '')).lower() in ('1', 'true', 'yes'))
+            if rule['window']:
+                # 立即在后台计算N日类规则的参考值
+                timestamp = cache.last_quote_update or datetime.now()
+                cache.refresh_alert_references(timestamp.strftime('%Y%m%d'))
+            cache.ensure_alert_poller()
+
+            response = jsonify(rule)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 201
+
+        except ValueError as e:
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 400
+        except Exception as e:
+            print(f"处理提醒规则请求失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/alerts/rules/<int:rule_id>', methods=['DELETE', 'OPTIONS'])
+    def delete_alert_rule(rule_id):
+        """删除提醒规则"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        if not cache.alerts.remove_rule(rule_id):
+            return jsonify({'error': f'提醒规则不存在: {rule_id}'}), 404
+        response = jsonify({'deleted': rule_id})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    @app.route('/api/alerts/recent', methods=['GET', 'OPTIONS'])
+    def recent_alerts():
+        """获取ID大于since_id的最近提醒（不使用SSE时的增量拉取）"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        since_id = request.args.get('since_id', 0, type=int)
+        response = jsonify({'alerts': cache.alerts.broker.recent_alerts(since_id)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    @app.route('/api/alerts/stream', methods=['GET'])
+    def alert_stream():
+        """SSE推送触发的提醒，支持Last-Event-ID续传最近的提醒"""
+        broker = cache.alerts.broker
+        last_id = request.headers.get('Last-Event-ID', request.args.get('since_id', 0))
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            last_id = 0
+
+        subscriber = broker.subscribe()
+        missed = broker.recent_alerts(last_id) if last_id else []
+
+        def format_event(alert):
+            return f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert, ensure_ascii=False)}\n\n"
+
+        def generate():
+            try:
+                # 立即发送一条注释，让客户端和代理尽快建立连接
+                yield ': connected\n\n'
+                sent_id = last_id
+                for alert in missed:
+                    sent_id = alert['id']
+                    yield format_event(alert)
+                while True:
+                    try:
+                        alerts = subscriber.get(timeout=SSE_CONFIG['heartbeat_seconds'])
+                    except queue.Empty:
+                        yield ': heartbeat\n\n'
+                        continue
+                    for alert in alerts:
+                        # 跳过续传时已发送过的提醒
+                        if alert['id'] > sent_id:
+                            sent_id = alert['id']
+                            yield format_event(alert)
+            finally:
+                broker.unsubscribe(subscriber)
+
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    print("行情提醒API路由设置完成")
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务端行情提醒模块
+提醒规则以列式数组存储（规则序号 -> 股票序号、类型、阈值、参考值、上次状态），
+每次市场快照刷新时对全部规则做一次向量化判断，只在条件由假变真时触发；
+触发的提醒推送给SSE订阅者，并按规则配置放入webhook发送队列
+"""
+
+import atexit
+import ipaddress
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+import numpy as np
+from kline_store import fen_to_yuan
+
+# 提醒配置
+ALERT_CONFIG = {
+    'max_rules': 200000,          # 规则数量上限
+    'max_window': 250,            # N日类规则的最大N
+    'recent_size': 500,           # 保留的最近提醒数量
+    'subscriber_queue_size': 1000,  # 每个SSE订阅者的待发送队列长度，满时丢弃
+    'webhook_queue_size': 10000,  # webhook待发送队列长度
+    'webhook_timeout': 5,         # webhook请求超时（秒）
+    'webhook_retries': 2,         # webhook失败重试次数
+    'webhook_allow_private': False,  # 是否允许webhook发送到内网/本机地址
+    'save_delay_seconds': 2,      # 规则变更后延迟保存的时间，期间的多次变更合并为一次写盘
+    'reference_retry_seconds': 60,     # 参考值计算失败后的首次重试间隔（秒），之后逐次加倍
+    'reference_retry_max_seconds': 3600  # 参考值重试间隔上限（秒）
+}
+
+# 规则类型: 名称 -> 编码
+RULE_TYPES = {
+    'price_above': 0,    # 最新价 > threshold
+    'price_below': 1,    # 最新价 < threshold
+    'pct_above': 2,      # 涨跌幅(%) > threshold
+    'pct_below': 3,      # 涨跌幅(%) < threshold
+    'pct_outside': 4,    # 涨跌幅(%)超出 [threshold, threshold2] 区间
+    'volume_spike': 5,   # 当日成交量 >= threshold × 前window日平均成交量
+    'breakout_high': 6,  # 最新价 > 前window日最高价
+    'breakout_low': 7    # 最新价 < 前window日最低价
+}
+RULE_TYPE_NAMES = {code: name for name, code in RULE_TYPES.items()}
+WINDOW_TYPES = (RULE_TYPES['volume_spike'], RULE_TYPES['breakout_high'], RULE_TYPES['breakout_low'])
+
+
+def validate_webhook_url(url):
+    """
+    校验webhook地址: 只允许http(s)，主机名解析出的地址都必须是公网地址（防止借webhook访问内网服务）
+    无效时抛出ValueError
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'无效的webhook地址: {url}')
+    if ALERT_CONFIG['webhook_allow_private']:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError) as e:
+        raise ValueError(f'无法解析webhook地址 {parts.hostname}: {e}')
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f'webhook地址不能指向内网或本机: {parts.hostname} ({address})')
+
+
+class AlertRuleTable:
+    """列式规则表，容量按倍数增长，删除的行放入空闲列表复用"""
+
+    COLUMNS = {
+        'rule_id': np.int64,
+        'sym': np.int32,        # 股票序号（symbols列表下标）
+        'kind': np.int8,
+        'threshold': np.float64,
+        'threshold2': np.float64,
+        'window': np.int16,
+        'reference': np.float64,  # N日类规则的参考值（均量/最高价/最低价），未计算时为NaN
+        'webhook': np.int32,    # webhooks列表下标，-1表示不发送webhook
+        'once': np.bool_,       # 触发一次后自动停用
+        'active': np.bool_,
+        'state': np.bool_       # 上一次判断的条件结果
+    }
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.size = 0  # 已使用的行数（含已删除的空闲行）
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.columns['reference'][:] = np.nan
+        self.free_rows = []
+        self.rows = {}  # rule_id -> 行号
+        self.next_id = 1
+        self.symbols = []        # 股票序号 -> ts_code
+        self.symbol_index = {}   # ts_code -> 股票序号
+        self.webhooks = []
+        self.webhook_index = {}
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            if name == 'reference':
+                grown[:] = np.nan
+            grown[:len(column)] = column
+            self.columns[name] = grown
+
+    def _intern(self, value, values, index):
+        position = index.get(value)
+        if position is None:
+            position = len(values)
+            values.append(value)
+            index[value] = position
+        return position
+
+    def add(self, ts_code, kind, threshold, threshold2=np.nan, window=0, webhook=None, once=False, rule_id=None):
+        """添加规则，返回规则ID"""
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow()
+            row = self.size
+            self.size += 1
+
+        if rule_id is None:
+            rule_id = self.next_id
+        self.next_id = max(self.next_id, rule_id + 1)
+
+        values = {
+            'rule_id': rule_id,
+            'sym': self._intern(ts_code, self.symbols, self.symbol_index),
+            'kind': kind,
+            'threshold': threshold,
+            'threshold2': threshold2,
+            'window': window,
+            'reference': np.nan,
+            'webhook': self._intern(webhook, self.webhooks, self.webhook_index) if webhook else -1,
+            'once': once,
+            'active': True,
+            'state': False
+        }
+        for name, value in values.items():
+            self.columns[name][row] = value
+        self.rows[rule_id] = row
+        return rule_id
+
+    def remove(self, rule_id):
+        """删除规则，不存在时返回False"""
+        row = self.rows.pop(rule_id, None)
+        if row is None:
+            return False
+        self.columns['active'][row] = False
+        self.columns['reference'][row] = np.nan
+        self.free_rows.append(row)
+        return True
+
+    def view(self, name):
+        """已使用行的列视图"""
+        return self.columns[name][:self.size]
+
+    def describe(self, row):
+        """将一行规则转换为字典"""
+        columns = self.columns
+        reference = float(columns['reference'][row])
+        return {
+            'id': int(columns['rule_id'][row]),
+            'ts_code': self.symbols[columns['sym'][row]],
+            'type': RULE_TYPE_NAMES[int(columns['kind'][row])],
+            'threshold': float(columns['threshold'][row]),
+            'threshold2': None if np.isnan(columns['threshold2'][row]) else float(columns['threshold2'][row]),
+            'window': int(columns['window'][row]),
+            'reference': None if np.isnan(reference) else round(reference, 4),
+            'has_webhook': bool(columns['webhook'][row] >= 0),  # 不返回webhook地址本身
+            'once': bool(columns['once'][row]),
+            'active': bool(columns['active'][row])
+        }
+
+    def webhook_url(self, row):
+        """规则的webhook地址，没有时返回None"""
+        webhook = int(self.columns['webhook'][row])
+        return self.webhooks[webhook] if webhook >= 0 else None
+
+    def save(self, path):
+        """保存有效规则（写入唯一的临时文件后替换）"""
+        rows = np.array(sorted(self.rows.values()), dtype=np.int64)
+        arrays = {name: self.columns[name][rows] for name in ('rule_id', 'sym', 'kind', 'threshold',
+                                                              'threshold2', 'window', 'webhook', 'once', 'active')}
+        arrays['symbols'] = np.array(self.symbols, dtype=str)
+        arrays['webhooks'] = np.array(self.webhooks, dtype=str)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                        prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, path):
+        """加载保存的规则，返回加载的数量"""
+        with np.load(path, allow_pickle=False) as data:
+            symbols = data['symbols'].tolist()
+            webhooks = data['webhooks'].tolist()
+            for i in range(len(data['rule_id'])):
+                webhook = int(data['webhook'][i])
+                self.add(symbols[data['sym'][i]], int(data['kind'][i]), float(data['threshold'][i]),
+                         float(data['threshold2'][i]), int(data['window'][i]),
+                         webhooks[webhook] if webhook >= 0 else None, bool(data['once'][i]),
+                         rule_id=int(data['rule_id'][i]))
+                self.columns['active'][self.rows[int(data['rule_id'][i])]] = bool(data['active'][i])
+            return len(data['rule_id'])
+
+
+def snapshot_columns(quotes, symbols):
+    """按股票序号从行情字典中取出最新价、涨跌幅、成交量列，缺失的股票标记为不存在"""
+    count = len(symbols)
+    present = np.zeros(count, dtype=bool)
+    close = np.full(count, np.nan)
+    pct_chg = np.full(count, np.nan)
+    vol = np.full(count, np.nan)
+    for sym, ts_code in enumerate(symbols):
+        quote = quotes.get(ts_code)
+        if quote is None:
+            continue
+        present[sym] = True
+        close[sym] = quote['close']
+        pct_chg[sym] = quote['pct_chg']
+        vol[sym] = quote['vol']
+    return present, close, pct_chg, vol
+
+
+def evaluate_rules(table, present, close, pct_chg, vol):
+    """
+    对全部规则做一次向量化判断
+    返回触发的行号数组；同时更新各规则的上次状态，停用已触发的一次性规则
+    """
+    sym = table.view('sym')
+    kind = table.view('kind')
+    threshold = table.view('threshold')
+    threshold2 = table.view('threshold2')
+    reference = table.view('reference')
+    active = table.view('active')
+    state = table.view('state')
+
+    listed = present[sym]
+    price = close[sym]
+    pct = pct_chg[sym]
+    volume = vol[sym]
+
+    with np.errstate(invalid='ignore'):
+        condition = np.select(
+            [kind == RULE_TYPES['price_above'], kind == RULE_TYPES['price_below'],
+             kind == RULE_TYPES['pct_above'], kind == RULE_TYPES['pct_below'],
+             kind == RULE_TYPES['pct_outside'], kind == RULE_TYPES['volume_spike'],
+             kind == RULE_TYPES['breakout_high'], kind == RULE_TYPES['breakout_low']],
+            [price > threshold, price < threshold,
+             pct > threshold, pct < threshold,
+             (pct < threshold) | (pct > threshold2), volume >= threshold * reference,
+             price > reference, price < reference],
+            default=False)
+
+    # 只在条件由假变真时触发；行情中暂无该股票时保持原状态
+    fired = np.flatnonzero(condition & ~state & active & listed)
+    np.copyto(state, condition, where=listed)
+    once = fired[table.view('once')[fired]]
+    active[once] = False
+    return fired
+
+
+def window_reference(bars, kind, window):
+    """由前window根K线（K线价格单位为分）计算N日类规则的参考值"""
+    bars = bars[-window:]
+    if len(bars) < window:
+        return np.nan
+    if kind == RULE_TYPES['volume_spike']:
+        return float(bars['vol'].mean())
+    if kind == RULE_TYPES['breakout_high']:
+        return float(fen_to_yuan(bars['high'].max()))
+    return float(fen_to_yuan(bars['low'].min()))
+
+
+class AlertBroker:
+    """提醒分发: 最近提醒缓冲、SSE订阅者队列和webhook发送队列"""
+
+    def __init__(self):
+        self.recent = deque(maxlen=ALERT_CONFIG['recent_size'])
+        self.subscribers = []
+        self.webhook_queue = queue.Queue(maxsize=ALERT_CONFIG['webhook_queue_size'])
+        self._lock = threading.Lock()
+        self._webhook_thread = None
+        self.next_id = 1
+        self.delivered = 0
+        self.dropped = 0
+        self.webhook_sent = 0
+        self.webhook_failed = 0
+
+    def subscribe(self):
+        """注册SSE订阅者，返回其待发送队列"""
+        subscriber = queue.Queue(maxsize=ALERT_CONFIG['subscriber_queue_size'])
+        with self._lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, alerts, webhooks):
+        """分发一批提醒；webhooks为 url -> 该url的提醒列表"""
+        with self._lock:
+            for alert in alerts:
+                alert['id'] = self.next_id
+                self.next_id += 1
+                self.recent.append(alert)
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(alerts)
+                self.delivered += 1
+            except queue.Full:
+                self.dropped += 1
+
+        for url, url_alerts in webhooks.items():
+            try:
+                self.webhook_queue.put_nowait((url, url_alerts))
+            except queue.Full:
+                self.webhook_failed += 1
+                print(f"webhook队列已满，丢弃发送到 {url} 的 {len(url_alerts)} 条提醒")
+        if webhooks:
+            self._ensure_webhook_thread()
+
+    def recent_alerts(self, since_id=0):
+        """获取ID大于since_id的最近提醒"""
+        with self._lock:
+            return [alert for alert in self.recent if alert['id'] > since_id]
+
+    def _ensure_webhook_thread(self):
+        with self._lock:
+            if self._webhook_thread is None or not self._webhook_thread.is_alive():
+                self._webhook_thread = threading.Thread(target=self._webhook_worker,
+                                                        name='alert-webhook', daemon=True)
+                self._webhook_thread.start()
+
+    def _webhook_worker(self):
+        """依次发送webhook队列中的提醒，失败时重试"""
+        import requests
+
+        while True:
+            url, alerts = self.webhook_queue.get()
+            try:
+                # 发送前重新校验，防止域名在添加规则后被解析到内网地址
+                validate_webhook_url(url)
+            except ValueError as e:
+                self.webhook_failed += 1
+                print(f"webhook {url} 已拒绝发送: {e}")
+                continue
+            body = json.dumps({'alerts': alerts}, ensure_ascii=False).encode('utf-8')
+            for attempt in range(ALERT_CONFIG['webhook_retries'] + 1):
+                try:
+                    # 不跟随重定向，避免被重定向到内网地址
+                    response = requests.post(url, data=body, timeout=ALERT_CONFIG['webhook_timeout'],
+                                             headers={'Content-Type': 'application/json'},
+                                             allow_redirects=False)
+                    if response.status_code < 400:
+                        self.webhook_sent += 1
+                        break
+                    print(f"webhook {url} 返回状态码 {response.status_code}")
+                except Exception as e:
+                    print(f"webhook {url} 发送失败: {e}")
+                time.sleep(0.5 * (attempt + 1))
+            else:
+                self.webhook_failed += 1
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'webhook_pending': self.webhook_queue.qsize(),
+            'webhook_sent': self.webhook_sent,
+            'webhook_failed': self.webhook_failed
+        }
+
+
+class AlertEngine:
+    """提醒规则管理和快照判断"""
+
+    def __init__(self, rules_file=None):
+        self.table = AlertRuleTable()
+        self.broker = AlertBroker()
+        self.rules_file = rules_file
+        self.reference_date = None  # 参考值对应的交易日（参考值只使用该日之前的K线）
+        self.reference_retry = {}   # ts_code -> (交易日, 连续失败次数, 下次重试时间)
+        self._lock = threading.Lock()
+        self._dirty = False         # 规则有未保存的变更
+        self._save_timer = None
+        self.evaluations = 0
+        self.last_eval_ms = 0.0
+        if rules_file and os.path.exists(rules_file):
+            try:
+                print(f"加载提醒规则: {self.table.load(rules_file)} 条")
+            except Exception as e:
+                print(f"加载提醒规则失败: {e}")
+        if rules_file:
+            # 进程退出前保存尚未写盘的规则变更
+            atexit.register(self.flush)
+
+    def _mark_dirty(self):
+        """标记规则有变更（调用方持有锁），延迟一段时间后合并保存"""
+        if not self.rules_file:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(ALERT_CONFIG['save_delay_seconds'], self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """保存尚未写盘的规则变更"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            try:
+                self.table.save(self.rules_file)
+            except Exception as e:
+                print(f"保存提醒规则失败: {e}")
+
+    def add_rule(self, ts_code, rule_type, threshold, threshold2=None, window=0, webhook=None, once=False):
+        """添加规则，参数无效时抛出ValueError，返回规则字典"""
+        kind = RULE_TYPES.get(rule_type)
+        if kind is None:
+            raise ValueError(f'不支持的提醒类型: {rule_type}')
+        if kind == RULE_TYPES['pct_outside']:
+            if threshold2 is None or threshold2 < threshold:
+                raise ValueError('pct_outside需要threshold <= threshold2')
+        if kind in WINDOW_TYPES:
+            if not 1 <= window <= ALERT_CONFIG['max_window']:
+                raise ValueError(f"window需要在1到{ALERT_CONFIG['max_window']}之间")
+        else:
+            window = 0
+        if kind == RULE_TYPES['volume_spike'] and threshold <= 0:
+            raise ValueError('volume_spike的threshold（放量倍数）需要大于0')
+        if webhook:
+            validate_webhook_url(webhook)
+
+        with self._lock:
+            if len(self.table.rows) >= ALERT_CONFIG['max_rules']:
+                raise ValueError(f"提醒规则最多 {ALERT_CONFIG['max_rules']} 条")
+            rule_id = self.table.add(ts_code, kind, float(threshold),
+                                     np.nan if threshold2 is None else float(threshold2),
+                                     int(window), webhook, bool(once))
+            rule = self.table.describe(self.table.rows[rule_id])
+            self._mark_dirty()
+        return rule
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            removed = self.table.remove(rule_id)
+            if removed:
+                self._mark_dirty()
+        return removed
+
+    def has_active_rules(self):
+        with self._lock:
+            return bool(self.table.view('active').any())
+
+    def list_rules(self, ts_code=None):
+        with self._lock:
+            return [self.table.describe(row) for row in sorted(self.table.rows.values())
+                    if ts_code is None or self.table.symbols[self.table.columns['sym'][row]] == ts_code]
+
+    def pending_reference_codes(self, trade_date):
+        """
+        需要（重新）计算参考值的股票: 交易日变化后的全部N日类规则，或尚未计算参考值的规则；
+        当日计算失败的股票在退避时间内跳过
+        """
+        with self._lock:
+            if not self.table.size:
+                return []
+            kind = self.table.view('kind')
+            window_rows = np.isin(kind, WINDOW_TYPES) & self.table.view('active')
+            if self.reference_date != trade_date:
+                rows = np.flatnonzero(window_rows)
+            else:
+                rows = np.flatnonzero(window_rows & np.isnan(self.table.view('reference')))
+            now = time.time()
+            ts_codes = []
+            for sym in np.unique(self.table.view('sym')[rows]):
+                ts_code = self.table.symbols[sym]
+                retry = self.reference_retry.get(ts_code)
+                if retry is not None and retry[0] == trade_date and now < retry[2]:
+                    continue
+                ts_codes.append(ts_code)
+            return ts_codes
+
+    def _record_reference_result(self, ts_code, trade_date, ok):
+        """记录参考值计算结果（调用方持有锁），失败时按次数加倍退避"""
+        if ok:
+            self.reference_retry.pop(ts_code, None)
+            return
+        retry = self.reference_retry.get(ts_code)
+        attempts = retry[1] + 1 if retry is not None and retry[0] == trade_date else 1
+        delay = min(ALERT_CONFIG['reference_retry_seconds'] * 2 ** (attempts - 1),
+                    ALERT_CONFIG['reference_retry_max_seconds'])
+        self.reference_retry[ts_code] = (trade_date, attempts, time.time() + delay)
+
+    def refresh_references(self, loader, trade_date, ts_codes):
+        """
+        计算指定股票的N日类规则参考值，只使用trade_date之前的K线
+        loader(ts_code, days)返回KlineSeries或None；K线在锁外加载，结果按规则ID写回
+        （加载期间规则可能被删除，其行也可能被新规则复用）
+        """
+        trade_date_int = int(trade_date)
+        for ts_code in ts_codes:
+            with self._lock:
+                sym = self.table.symbol_index.get(ts_code)
+                if sym is None:
+                    continue
+                rows = np.flatnonzero((self.table.view('sym') == sym) & self.table.view('active')
+                                      & np.isin(self.table.view('kind'), WINDOW_TYPES))
+                columns = self.table.columns
+                rules = [(int(columns['rule_id'][row]), int(columns['kind'][row]), int(columns['window'][row]))
+                         for row in rows]
+            if not rules:
+                continue
+
+            try:
+                series = loader(ts_code, max(window for _, _, window in rules) + 1)
+            except Exception as e:
+                print(f"加载 {ts_code} 的K线失败: {e}")
+                series = None
+            references = {}
+            if series is not None:
+                bars = series.bars[series.bars['trade_date'] < trade_date_int]
+                references = {rule_id: window_reference(bars, kind, window) for rule_id, kind, window in rules}
+
+            with self._lock:
+                columns = self.table.columns
+                for rule_id, reference in references.items():
+                    row = self.table.rows.get(rule_id)
+                    if row is not None:
+                        columns['reference'][row] = reference
+                # K线加载失败或K线不足N日时参考值仍为NaN，退避后再重试
+                ok = bool(references) and not any(np.isnan(value) for value in references.values())
+                self._record_reference_result(ts_code, trade_date, ok)
+        with self._lock:
+            self.reference_date = trade_date
+
+    def evaluate(self, quotes, timestamp, notify=True):
+        """
+        对快照判断全部规则并分发触发的提醒，返回触发数量
+        notify为False时只更新规则状态（例如启动时从归档恢复的快照），不分发提醒
+        """
+        if not quotes:
+            return 0
+
+        started = time.perf_counter()
+        with self._lock:
+            table = self.table
+            if not table.rows:
+                return 0
+            present, close, pct_chg, vol = snapshot_columns(quotes, table.symbols)
+            fired = evaluate_rules(table, present, close, pct_chg, vol)
+
+            alerts = []
+            webhooks = {}
+            if notify and len(fired):
+                columns = table.columns
+                time_text = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                for row in fired:
+                    sym = columns['sym'][row]
+                    alert = dict(table.describe(row), rule_id=int(columns['rule_id'][row]),
+                                 price=float(close[sym]), pct_chg=float(pct_chg[sym]),
+                                 vol=float(vol[sym]), time=time_text)
+                    del alert['id']
+                    alerts.append(alert)
+                    url = table.webhook_url(row)
+                    if url:
+                        webhooks.setdefault(url, []).append(alert)
+            if len(fired) and table.view('once')[fired].any():
+                self._mark_dirty()
+            self.evaluations += 1
+            self.last_eval_ms = (time.perf_counter() - started) * 1000
+
+        if alerts:
+            self.broker.publish(alerts, webhooks)
+            print(f"行情提醒: 触发 {len(alerts)} 条，判断耗时 {self.last_eval_ms:.2f}ms")
+        return len(alerts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rules': len(self.table.rows),
+                'symbols': len(self.table.symbols),
+                'evaluations': self.evaluations,
+                'last_eval_ms': round(self.last_eval_ms, 3),
+                'reference_date': self.reference_date,
+                'reference_backoff': len(self.reference_retry),
+                'delivery': self.broker.stats()
+            }
@@ -5,13 +5,19 @@
 整合所有模块，启动Flask应用服务
 """
 
-from flask import Flask, send_from_directory
+from flask import Flask, abort, request
 from flask_cors import CORS
+import argparse
 import os
+import threading
 
 # 导入自定义模块
-from stock_data import create_stock_cache, STOCK_LIST_CACHE_FILE
+from stock_data import create_stock_cache, STOCK_LIST_CACHE_FILE, SNAPSHOT_ARCHIVE_DIR
+from snapshot_archive import replay
+from static_assets import StaticAssetBundle
 from stock_api import setup_stock_routes
+from admin_api import setup_admin_routes
+from alert_api import setup_alert_routes
 
 # Flask应用配置
 FLASK_CONFIG = {
@@ -23,8 +29,8 @@ FLASK_CONFIG = {
 # CORS配置
 CORS_CONFIG = {
     'origins': ['*'],
-    'methods': ['GET', 'POST', 'OPTIONS'],
-    'allow_headers': ['Content-Type'],
+    'methods': ['GET', 'POST', 'DELETE', 'OPTIONS'],
+    'allow_headers': ['Content-Type', 'X-Admin-Token'],
     'supports_credentials': False
 }
 
@@ -39,21 +45,50 @@ cache = create_stock_cache()
 
 # 设置所有API路由
 setup_stock_routes(app, cache)
+setup_admin_routes(app, cache)
+setup_alert_routes(app, cache)
+
+# 启动时预处理前端静态资源（压缩、预压缩、内容哈希文件名）
+static_assets = StaticAssetBundle(os.path.dirname(os.path.abspath(__file__)))
 
 # 添加前端静态文件路由
 @app.route('/')
 def index():
     """主页面"""
-    return send_from_directory('.', 'index.html')
+    return static_assets.response_for('index.html', request)
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    """静态文件服务"""
-    return send_from_directory('.', filename)
+    """静态文件服务 - 只提供已知的前端资源"""
+    response = static_assets.response_for(filename, request)
+    if response is None:
+        abort(404)
+    return response
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='股票信息查看器后端')
+    parser.add_argument('--replay', metavar='YYYYMMDD',
+                        help='回放指定日期的快照归档（离线测试，不请求实时行情）')
+    parser.add_argument('--replay-speed', type=float, default=10.0,
+                        help='回放倍速，默认10倍；0表示不等待')
+    return parser.parse_args()
+
+
+def start_replay(day, speed):
+    """在后台线程中回放快照归档"""
+    cache.replay_mode = True
+    thread = threading.Thread(target=replay, args=(cache, SNAPSHOT_ARCHIVE_DIR, day, speed),
+                              name='snapshot-replay', daemon=True)
+    thread.start()
+    return thread
 
 
 def main():
     """主函数 - 启动Flask应用"""
+    args = parse_args()
+    
     print("股票信息查看器启动中...")
     print("股票列表缓存状态:", "有效" if cache.is_cache_valid(STOCK_LIST_CACHE_FILE) else "需要更新")
     print("📡 数据源: EasyQuotation (实时数据)")
@@ -64,6 +99,10 @@ def main():
     print("一体化服务启动 - 无需启动多个服务！")
     print("=" * 50)
     
+    if args.replay:
+        print(f"回放模式: {args.replay}，倍速 {args.replay_speed}")
+        start_replay(args.replay, args.replay_speed)
+    
     # 启动Flask应用
     app.run(**FLASK_CONFIG)
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台刷新模块
+在线程池中执行缓存刷新任务；同一个键同时只会有一个刷新任务（后台或同步）在执行。
+批量任务（如缓存预热）使用独立的小线程池，不会占满常规刷新的线程
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class _RefreshTask:
+    """进行中任务表的条目: started在任务真正开始执行时置为True，bulk表示在批量线程池中排队"""
+
+    __slots__ = ('future', 'started', 'bulk')
+
+    def __init__(self, started=False, bulk=False):
+        self.future = Future()
+        self.started = started
+        self.bulk = bulk
+
+
+class BackgroundRefresher:
+    """按键去重的刷新线程池，后台任务和同步刷新共用同一个进行中任务表"""
+
+    def __init__(self, max_workers=4, name='cache-refresh', bulk_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._bulk_executor = ThreadPoolExecutor(max_workers=bulk_workers, thread_name_prefix=f'{name}-bulk')
+        self._inflight = {}  # 键 -> 该键已提交（排队中或执行中）的任务
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.joined = 0
+        self.taken_over = 0
+        self.failed = 0
+
+    def _finish(self, key, task, func, args, kwargs):
+        """执行任务并设置其结果，结束后从进行中任务表移除"""
+        try:
+            result = func(*args, **kwargs)
+            task.future.set_result(result)
+            return result
+        except Exception as e:
+            task.future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        提交后台刷新任务，该键已有任务在排队或执行时直接返回False
+        该键只是在批量线程池中排队时，由常规线程池接管，不必等批量队列轮到它
+        """
+        return self._submit(self._executor, False, key, func, args, kwargs)
+
+    def submit_bulk(self, key, func, *args, **kwargs):
+        """提交批量任务（如缓存预热）到独立的批量线程池，该键已有任务在排队或执行时返回False"""
+        return self._submit(self._bulk_executor, True, key, func, args, kwargs)
+
+    def _submit(self, executor, bulk, key, func, args, kwargs):
+        task = _RefreshTask(bulk=bulk)
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                if bulk or existing.started or not existing.bulk:
+                    self.deduplicated += 1
+                    return False
+                # 排队中的批量任务不再执行
+                existing.started = True
+                self.taken_over += 1
+            self._inflight[key] = task
+            self.submitted += 1
+
+        def work():
+            with self._lock:
+                if task.started:
+                    # 排队期间已被同步刷新接管
+                    return
+                task.started = True
+            try:
+                self._finish(key, task, func, args, kwargs)
+            except Exception as e:
+                self.failed += 1
+                print(f"后台刷新 {key} 失败: {e}")
+
+        executor.submit(work)
+        return True
+
+    def run(self, key, func, *args, **kwargs):
+        """
+        在当前线程中同步执行刷新并返回结果
+        该键已有任务正在执行时先等待其完成再执行func；func应在数据已被刷新时直接返回缓存结果，
+        因此并发的同一键请求只会请求一次上游。
+        该键的后台任务还在线程池中排队时不等待整个队列，而是由当前线程接管:
+        排队的任务不再执行，当前线程执行func并把结果交给等待该任务的调用方
+        """
+        while True:
+            with self._lock:
+                task = self._inflight.get(key)
+                if task is None:
+                    task = _RefreshTask(started=True)
+                    self._inflight[key] = task
+                    break
+                if not task.started:
+                    task.started = True
+                    self.taken_over += 1
+                    break
+                self.joined += 1
+            try:
+                task.future.result()
+            except Exception:
+                pass
+
+        return self._finish(key, task, func, args, kwargs)
+
+    def is_refreshing(self, key):
+        """该键是否有刷新任务在排队或执行"""
+        with self._lock:
+            return key in self._inflight
+
+    def stats(self):
+        """获取提交、去重、同步等待、接管、失败次数和排队或执行中的任务数"""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'joined': self.joined,
+                'taken_over': self.taken_over,
+                'failed': self.failed,
+                'inflight': len(self._inflight)
+            }
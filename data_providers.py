@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情数据源模块
+统一的数据源接口（日K线、市场快照、股票全集），内置新浪、腾讯和本地文件三个数据源；
+ProviderPool按健康评分排序数据源，失败时自动切换，并可在主数据源超过其p95延迟仍未返回时
+向备用数据源发起对冲请求，取先返回的结果；本地文件数据源只作为所有实时数据源失败后的兜底，
+其返回的数据标记为过期数据
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# 数据源配置
+PROVIDER_CONFIG = {
+    'request_timeout': 10,       # 单次HTTP请求超时（秒）
+    'latency_window': 100,       # 用于计算延迟分位数的样本数
+    'ewma_alpha': 0.2,           # 成功率指数加权系数
+    'failure_threshold': 3,      # 连续失败多少次后进入冷却
+    'cooldown_seconds': 60,      # 冷却时长（秒），冷却中的数据源排到最后
+    'hedge_min_samples': 20,     # 延迟样本数达到该值后才启用对冲请求
+    'hedge_min_delay': 0.05      # 对冲等待的最短时间（秒）
+}
+
+OPERATIONS = ('kline', 'snapshot', 'universe')
+
+
+def split_ts_code(ts_code):
+    """将000001.SZ转换为sz000001格式，格式无效时返回None"""
+    market_code = ts_code.split('.')
+    if len(market_code) != 2:
+        return None
+    return f"{market_code[1].lower()}{market_code[0]}"
+
+
+class DataProvider:
+    """数据源接口，各方法失败时返回None"""
+
+    name = 'base'
+    stale = False  # 是否为过期数据兜底源（总是排在实时数据源之后，返回的数据标记为过期）
+
+    def fetch_kline(self, ts_code, datalen):
+        """获取最近datalen条日K线，返回按日期升序的字典列表（价格单位元，成交量单位股）"""
+        raise NotImplementedError
+
+    def market_snapshot(self):
+        """获取全市场快照，返回 带前缀代码(sh600000) -> 行情字典；
+        行情字典字段与easyquotation新浪格式一致: name/now/close/open/high/low/turnover(成交量)/volume(成交额)"""
+        raise NotImplementedError
+
+    def stock_universe(self):
+        """获取股票全集，返回 带前缀代码 -> 包含name字段的字典"""
+        return self.market_snapshot()
+
+
+def _records_with_pre_close(records):
+    """按日期排序并计算昨收价（第一条记录的昨收价设为开盘价）"""
+    records.sort(key=lambda x: x['trade_date'])
+    for i, record in enumerate(records):
+        record['pre_close'] = records[i-1]['close'] if i > 0 else record['open']
+    return records
+
+
+class SinaProvider(DataProvider):
+    """新浪财经: getKLineData日K线 + easyquotation('sina')快照"""
+
+    name = 'sina'
+    KLINE_URL = "https://money.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData"
+
+    def __init__(self):
+        import easyquotation
+        self.quotation = easyquotation.use('sina')
+
+    def fetch_kline(self, ts_code, datalen):
+        import requests
+
+        sina_code = split_ts_code(ts_code)  # 例如: sz000001, sh600519
+        if sina_code is None:
+            print(f"无效的股票代码格式: {ts_code}")
+            return None
+
+        params = {
+            'symbol': sina_code,
+            'scale': '240',  # 日线
+            'ma': 'no',
+            'datalen': str(datalen)  # 获取指定条数
+        }
+
+        print(f"请求新浪财经API: {sina_code}")
+        response = requests.get(self.KLINE_URL, params=params, timeout=PROVIDER_CONFIG['request_timeout'])
+
+        if response.status_code != 200:
+            print(f"新浪财经API请求失败，状态码: {response.status_code}")
+            return None
+
+        content = response.text
+        if not content.strip():
+            print("新浪财经API返回空数据")
+            return None
+
+        try:
+            kline_data = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"新浪财经API返回数据解析失败: {e}")
+            print(f"返回内容片段: {content[:200]}...")
+            return None
+
+        if not kline_data:
+            print("新浪财经API返回空的K线数据")
+            return None
+
+        print(f"从新浪财经获取到 {len(kline_data)} 条真实K线数据")
+
+        records = []
+        for record in kline_data:
+            try:
+                # 新浪财经返回格式: {"day":"2025-07-08","open":"12.750","high":"12.840","low":"12.650","close":"12.690","volume":"109098597"}
+                records.append({
+                    'ts_code': ts_code,
+                    'trade_date': record['day'].replace('-', ''),  # 转换为YYYYMMDD格式
+                    'open': float(record['open']),
+                    'high': float(record['high']),
+                    'low': float(record['low']),
+                    'close': float(record['close']),
+                    'vol': int(float(record['volume'])),
+                    'amount': 0  # 新浪数据中没有成交额
+                })
+            except (KeyError, ValueError) as e:
+                print(f"解析K线记录失败: {e}, 记录: {record}")
+
+        return _records_with_pre_close(records) if records else None
+
+    def market_snapshot(self):
+        return self.quotation.market_snapshot(prefix=True) or None
+
+
+class TencentProvider(DataProvider):
+    """腾讯财经: fqkline日K线（不复权） + easyquotation('tencent')快照"""
+
+    name = 'tencent'
+    KLINE_URL = "https://web.ifzq.gtimg.cn/appstock/app/fqkline/get"
+
+    def __init__(self):
+        import easyquotation
+        self.quotation = easyquotation.use('tencent')
+
+    def fetch_kline(self, ts_code, datalen):
+        import requests
+
+        tencent_code = split_ts_code(ts_code)
+        if tencent_code is None:
+            print(f"无效的股票代码格式: {ts_code}")
+            return None
+
+        print(f"请求腾讯财经API: {tencent_code}")
+        response = requests.get(self.KLINE_URL, params={'param': f"{tencent_code},day,,,{datalen},"},
+                                timeout=PROVIDER_CONFIG['request_timeout'])
+        if response.status_code != 200:
+            print(f"腾讯财经API请求失败，状态码: {response.status_code}")
+            return None
+
+        try:
+            data = response.json()['data'][tencent_code]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"腾讯财经API返回数据解析失败: {e}")
+            return None
+
+        # 返回格式: ["2025-07-08", "开盘", "收盘", "最高", "最低", "成交量(手)", ...]
+        rows = data.get('day') or data.get('qfqday') or []
+        records = []
+        for row in rows:
+            try:
+                records.append({
+                    'ts_code': ts_code,
+                    'trade_date': row[0].replace('-', ''),
+                    'open': float(row[1]),
+                    'close': float(row[2]),
+                    'high': float(row[3]),
+                    'low': float(row[4]),
+                    'vol': int(float(row[5]) * 100),  # 手 -> 股
+                    'amount': 0
+                })
+            except (IndexError, ValueError) as e:
+                print(f"解析K线记录失败: {e}, 记录: {row}")
+
+        print(f"从腾讯财经获取到 {len(records)} 条K线数据")
+        return _records_with_pre_close(records) if records else None
+
+    def market_snapshot(self):
+        data = self.quotation.market_snapshot(prefix=True)
+        if not data:
+            return None
+
+        # 转换为与新浪一致的字段: turnover为成交量(股)，volume为成交额(元)
+        snapshot = {}
+        for code, quote in data.items():
+            snapshot[code] = {
+                'name': quote.get('name'),
+                'now': quote.get('now', 0),
+                'close': quote.get('close', 0),
+                'open': quote.get('open', 0),
+                'high': quote.get('high', 0),
+                'low': quote.get('low', 0),
+                'turnover': quote.get('成交量(手)', 0),
+                'volume': quote.get('成交额(万)', 0)
+            }
+        return snapshot
+
+
+class LocalFileProvider(DataProvider):
+    """
+    本地文件数据源: K线来自K线存储目录，快照来自最近一天的快照归档，用于离线运行和测试
+    数据可能已经过期，只在所有实时数据源都失败后使用
+    """
+
+    name = 'local'
+    stale = True
+
+    def __init__(self, kline_root, snapshot_root):
+        self.kline_root = kline_root
+        self.snapshot_root = snapshot_root
+
+    def fetch_kline(self, ts_code, datalen):
+        from kline_store import KlineStore
+
+        series, _ = KlineStore(self.kline_root).load(ts_code)
+        if series is None or len(series) == 0:
+            return None
+
+        frame = series.to_frame(series.window_start(days=datalen))
+        return [
+            {
+                'ts_code': ts_code,
+                'trade_date': row.trade_date,
+                'open': row.open,
+                'high': row.high,
+                'low': row.low,
+                'close': row.close,
+                'pre_close': row.pre_close,
+                'vol': int(row.vol),
+                'amount': 0
+            }
+            for row in frame.itertuples(index=False)
+        ]
+
+    def market_snapshot(self):
+        from snapshot_archive import SnapshotArchiveReader
+
+        if not os.path.exists(self.snapshot_root):
+            return None
+        days = sorted(name[:-4] for name in os.listdir(self.snapshot_root) if name.endswith('.bin'))
+        for day in reversed(days):
+            reader = SnapshotArchiveReader(self.snapshot_root, day)
+            _, records = reader.latest()
+            if records is None:
+                continue
+
+            # 归档中没有股票名称，不返回name字段，避免覆盖股票列表中已有的名称
+            snapshot = {}
+            for ts_code, quote in reader.to_quotes(records).items():
+                symbol, market = ts_code.split('.')
+                snapshot[f"{market.lower()}{symbol}"] = {
+                    'now': quote['close'],
+                    'close': quote['pre_close'],
+                    'open': quote['open'],
+                    'high': quote['high'],
+                    'low': quote['low'],
+                    'turnover': quote['vol'],
+                    'volume': quote['amount']
+                }
+            return snapshot
+        return None
+
+
+class ProviderHealth:
+    """单个数据源单类操作的健康统计"""
+
+    __slots__ = ('success_rate', 'latencies', 'consecutive_failures', 'cooldown_until',
+                 'calls', 'failures', 'hedged_wins')
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.latencies = deque(maxlen=PROVIDER_CONFIG['latency_window'])
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.hedged_wins = 0
+
+    def record(self, ok, latency):
+        alpha = PROVIDER_CONFIG['ewma_alpha']
+        self.calls += 1
+        self.success_rate = (1 - alpha) * self.success_rate + alpha * (1.0 if ok else 0.0)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= PROVIDER_CONFIG['failure_threshold']:
+                self.cooldown_until = time.time() + PROVIDER_CONFIG['cooldown_seconds']
+
+    def latency_quantile(self, q):
+        if not self.latencies:
+            return None
+        return float(np.quantile(np.fromiter(self.latencies, dtype=float), q))
+
+    def in_cooldown(self):
+        return time.time() < self.cooldown_until
+
+    def has_samples(self):
+        return self.calls > 0
+
+    def score(self):
+        """健康评分: 成功率 / (1 + 中位延迟)，冷却中为0；没有延迟样本时返回None"""
+        if self.in_cooldown():
+            return 0.0
+        p50 = self.latency_quantile(0.5)
+        if p50 is None:
+            return None
+        return self.success_rate / (1.0 + p50)
+
+    def snapshot(self):
+        p50 = self.latency_quantile(0.5)
+        p95 = self.latency_quantile(0.95)
+        score = self.score()
+        return {
+            'score': round(score, 4) if score is not None else None,
+            'success_rate': round(self.success_rate, 4),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'calls': self.calls,
+            'failures': self.failures,
+            'hedged_wins': self.hedged_wins,
+            'in_cooldown': self.in_cooldown()
+        }
+
+
+class ProviderPool:
+    """按健康评分调度多个数据源，支持自动切换和对冲请求"""
+
+    def __init__(self, providers, hedge=True, max_workers=8):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.health = {(provider.name, op): ProviderHealth()
+                       for provider in self.providers for op in OPERATIONS}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='provider')
+
+    def ordered(self, op):
+        """
+        排序数据源: 实时数据源在前，过期数据兜底源总是排在最后
+        实时数据源都有调用样本之前按配置顺序（冷却中的排到后面），之后按健康评分排序，评分相同时保持配置顺序
+        """
+        with self._lock:
+            live = [provider for provider in self.providers if not provider.stale]
+            fallback = [provider for provider in self.providers if provider.stale]
+            health = [self.health[(provider.name, op)] for provider in live]
+
+            if all(item.has_samples() for item in health):
+                scores = [item.score() or 0.0 for item in health]
+                order = sorted(range(len(live)), key=lambda i: -scores[i])
+            else:
+                order = sorted(range(len(live)), key=lambda i: health[i].in_cooldown())
+            return [live[i] for i in order] + fallback
+
+    def _invoke(self, provider, op, args):
+        """调用数据源并记录健康统计，失败返回None"""
+        started = time.perf_counter()
+        try:
+            if op == 'kline':
+                result = provider.fetch_kline(*args)
+            elif op == 'snapshot':
+                result = provider.market_snapshot()
+            else:
+                result = provider.stock_universe()
+        except Exception as e:
+            print(f"数据源 {provider.name} 的 {op} 请求失败: {e}")
+            result = None
+
+        with self._lock:
+            self.health[(provider.name, op)].record(bool(result), time.perf_counter() - started)
+        return result
+
+    def _hedge_delay(self, provider, op):
+        """主数据源的对冲等待时间（p95延迟），样本不足时返回None"""
+        with self._lock:
+            health = self.health[(provider.name, op)]
+            if len(health.latencies) < PROVIDER_CONFIG['hedge_min_samples']:
+                return None
+            return max(health.latency_quantile(0.95), PROVIDER_CONFIG['hedge_min_delay'])
+
+    def call(self, op, *args):
+        """
+        依次尝试各数据源直到成功，返回(结果, 是否为过期数据)
+        启用对冲时，主数据源超过其p95延迟仍未返回，则同时请求下一个数据源，取先成功的结果
+        """
+        candidates = self.ordered(op)
+        index = 0
+        while index < len(candidates):
+            primary = candidates[index]
+            secondary = candidates[index + 1] if index + 1 < len(candidates) else None
+            if secondary is not None and secondary.stale:
+                # 不向过期数据兜底源发起对冲请求
+                secondary = None
+            delay = self._hedge_delay(primary, op) if self.hedge and secondary is not None else None
+
+            if delay is None:
+                result = self._invoke(primary, op, args)
+                if result:
+                    if primary.stale:
+                        print(f"实时数据源的 {op} 请求均失败，使用 {primary.name} 的过期数据")
+                    return result, primary.stale
+                index += 1
+                continue
+
+            # 对冲计时从主数据源请求真正开始时算起，而不是从进入线程池队列时算起，
+            # 否则线程池繁忙时主请求还在排队就会触发无意义的对冲
+            started = threading.Event()
+
+            def invoke_primary(provider=primary):
+                started.set()
+                return self._invoke(provider, op, args)
+
+            futures = {self._executor.submit(invoke_primary): primary}
+            started.wait()
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                print(f"数据源 {primary.name} 超过p95延迟 {delay * 1000:.0f}ms 未返回，对冲请求 {secondary.name}")
+                futures[self._executor.submit(self._invoke, secondary, op, args)] = secondary
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result:
+                        provider = futures[future]
+                        if provider is not primary:
+                            with self._lock:
+                                self.health[(provider.name, op)].hedged_wins += 1
+                        return result, provider.stale
+
+            # 参与本轮的数据源都失败，继续尝试后面的数据源
+            index += len(futures)
+
+        print(f"所有数据源的 {op} 请求均失败")
+        return None, False
+
+    def fetch_kline(self, ts_code, datalen):
+        return self.call('kline', ts_code, datalen)
+
+    def market_snapshot(self):
+        return self.call('snapshot')
+
+    def stock_universe(self):
+        return self.call('universe')
+
+    def stats(self):
+        """各数据源各类操作的健康统计"""
+        with self._lock:
+            return {provider.name: {op: self.health[(provider.name, op)].snapshot() for op in OPERATIONS}
+                    for provider in self.providers}
+
+
+def create_provider_pool(names, kline_root, snapshot_root, hedge=True):
+    """按名称列表创建数据源池，初始化失败的数据源会被跳过"""
+    factories = {
+        'sina': SinaProvider,
+        'tencent': TencentProvider,
+        'local': lambda: LocalFileProvider(kline_root, snapshot_root)
+    }
+
+    providers = []
+    for name in names:
+        factory = factories.get(name)
+        if factory is None:
+            print(f"未知的数据源: {name}")
+            continue
+        try:
+            providers.append(factory())
+            print(f"数据源 {name} 初始化成功")
+        except Exception as e:
+            print(f"数据源 {name} 初始化失败: {e}")
+
+    return ProviderPool(providers, hedge=hedge)
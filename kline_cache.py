@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按字节预算的K线内存缓存
+采用W-TinyLFU淘汰策略: 新条目先进入小的LRU窗口区，被挤出窗口时与主区(SLRU)的淘汰候选
+比较访问频率(Count-Min Sketch估算)，频率更高者留下，避免一次全市场扫描冲掉热点股票
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# 缓存分区比例
+WINDOW_RATIO = 0.01     # 窗口区占总预算的比例
+PROTECTED_RATIO = 0.8   # 保护区占主区预算的比例
+
+
+class FrequencySketch:
+    """4行Count-Min Sketch，计数上限15，累计增量达到sample_size后整体减半以实现老化"""
+
+    __slots__ = ('width', 'mask', 'table', 'seeds', 'additions', 'sample_size')
+
+    def __init__(self, width=4096, sample_size=None):
+        width = 1 << max(int(width - 1).bit_length(), 4)
+        self.width = width
+        self.mask = width - 1
+        self.table = np.zeros((4, width), dtype=np.uint8)
+        self.seeds = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+        self.additions = 0
+        self.sample_size = sample_size or width * 10
+
+    def _indexes(self, key):
+        h = hash(key)
+        return [((h ^ seed) * 0x01000193 >> 7) & self.mask for seed in self.seeds]
+
+    def increment(self, key):
+        """记录一次访问"""
+        for row, index in enumerate(self._indexes(key)):
+            if self.table[row, index] < 15:
+                self.table[row, index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def frequency(self, key):
+        """估算访问频率"""
+        return int(min(self.table[row, index] for row, index in enumerate(self._indexes(key))))
+
+    def clear(self):
+        self.table.fill(0)
+        self.additions = 0
+
+
+class CacheEntry:
+    """缓存条目，附带大小和访问统计"""
+
+    __slots__ = ('key', 'value', 'size', 'created_at', 'last_access', 'hits', 'segment')
+
+    def __init__(self, key, value, size, segment):
+        self.key = key
+        self.value = value
+        self.size = size
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.hits = 0
+        self.segment = segment
+
+
+class KlineCache:
+    """按字节预算的W-TinyLFU缓存"""
+
+    def __init__(self, max_bytes, sketch_width=4096):
+        self.max_bytes = int(max_bytes)
+        self.window_max = max(int(self.max_bytes * WINDOW_RATIO), 1)
+        self.protected_max = int((self.max_bytes - self.window_max) * PROTECTED_RATIO)
+        self.sketch = FrequencySketch(sketch_width)
+
+        # 三个分区均为 key -> CacheEntry 的有序字典，头部为最久未使用
+        self._segments = {'window': OrderedDict(), 'probation': OrderedDict(),
+                          'protected': OrderedDict()}
+        self._bytes = {'window': 0, 'probation': 0, 'protected': 0}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # 内部辅助
+    # ------------------------------------------------------------------
+    def _find(self, key):
+        for segment in self._segments.values():
+            entry = segment.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def _remove(self, entry):
+        del self._segments[entry.segment][entry.key]
+        self._bytes[entry.segment] -= entry.size
+
+    def _add(self, entry, segment):
+        entry.segment = segment
+        self._segments[segment][entry.key] = entry
+        self._bytes[segment] += entry.size
+
+    def _main_bytes(self):
+        return self._bytes['probation'] + self._bytes['protected']
+
+    def _evict(self, entry):
+        self._remove(entry)
+        self.evictions += 1
+
+    def _rebalance(self):
+        """将窗口区溢出的条目按频率准入主区，并把总占用控制在预算内"""
+        main_max = self.max_bytes - self.window_max
+
+        # 保护区溢出的条目降级到试用区
+        protected = self._segments['protected']
+        while self._bytes['protected'] > self.protected_max and protected:
+            _, entry = protected.popitem(last=False)
+            self._bytes['protected'] -= entry.size
+            self._add(entry, 'probation')
+
+        window = self._segments['window']
+        while self._bytes['window'] > self.window_max and window:
+            candidate = next(iter(window.values()))
+            self._remove(candidate)
+
+            if self._main_bytes() + candidate.size <= main_max:
+                self._add(candidate, 'probation')
+                continue
+
+            # 主区已满: 候选者需要比试用区的淘汰对象更常被访问才能准入
+            candidate_freq = self.sketch.frequency(candidate.key)
+            admitted = True
+            victims = []
+            freed = main_max - self._main_bytes()
+            for victim in self._segments['probation'].values():
+                if freed >= candidate.size:
+                    break
+                if self.sketch.frequency(victim.key) >= candidate_freq:
+                    admitted = False
+                    break
+                victims.append(victim)
+                freed += victim.size
+
+            if admitted and freed >= candidate.size:
+                for victim in victims:
+                    self._evict(victim)
+                self._add(candidate, 'probation')
+            else:
+                self.evictions += 1
+
+        # 兜底: 单个条目过大或保护区占满时按 试用区 -> 保护区 的顺序淘汰
+        for name in ('probation', 'protected'):
+            segment = self._segments[name]
+            while self._main_bytes() > main_max and segment:
+                self._evict(next(iter(segment.values())))
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+    def get(self, key):
+        """获取缓存值，未命中返回None"""
+        with self._lock:
+            self.sketch.increment(key)
+            entry = self._find(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry.hits += 1
+            entry.last_access = time.time()
+            if entry.segment == 'probation':
+                # 试用区再次命中后晋升到保护区
+                self._remove(entry)
+                self._add(entry, 'protected')
+                self._rebalance()
+            else:
+                self._segments[entry.segment].move_to_end(key)
+            return entry.value
+
+    def put(self, key, value, size):
+        """写入缓存值，size为该值占用的字节数"""
+        with self._lock:
+            size = int(size)
+            entry = self._find(key)
+            if entry is not None:
+                # 更新已有条目时保留其所在分区和访问统计
+                self._remove(entry)
+                entry.value = value
+                entry.size = size
+                self._add(entry, entry.segment)
+            else:
+                self._add(CacheEntry(key, value, size, 'window'), 'window')
+            self._rebalance()
+
+    def pop(self, key):
+        """移除缓存条目，返回被移除的值"""
+        with self._lock:
+            entry = self._find(key)
+            if entry is None:
+                return None
+            self._remove(entry)
+            return entry.value
+
+    def pop_many(self, keys):
+        """批量移除缓存条目，返回实际被移除的键列表"""
+        with self._lock:
+            removed = []
+            for key in keys:
+                entry = self._find(key)
+                if entry is not None:
+                    self._remove(entry)
+                    removed.append(key)
+            return removed
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            for name, segment in self._segments.items():
+                segment.clear()
+                self._bytes[name] = 0
+            self.sketch.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._find(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(segment) for segment in self._segments.values())
+
+    @property
+    def bytes_used(self):
+        """当前占用的字节数"""
+        return sum(self._bytes.values())
+
+    def _describe(self, entry, now):
+        return {
+            'key': entry.key,
+            'value': entry.value,
+            'size': entry.size,
+            'segment': entry.segment,
+            'hits': entry.hits,
+            'frequency': self.sketch.frequency(entry.key),
+            'cached_seconds': round(now - entry.created_at, 1),
+            'idle_seconds': round(now - entry.last_access, 1)
+        }
+
+    def entries(self):
+        """获取所有条目的统计快照（键、值、大小、分区、命中次数、估算访问频率、驻留和空闲时长）"""
+        with self._lock:
+            now = time.time()
+            return [self._describe(entry, now)
+                    for segment in self._segments.values() for entry in segment.values()]
+
+    def hot_keys(self, n=10):
+        """按估算访问频率（其次按命中次数）返回最热的n个条目的统计"""
+        with self._lock:
+            now = time.time()
+            candidates = (entry for segment in self._segments.values() for entry in segment.values())
+            top = heapq.nlargest(n, candidates,
+                                 key=lambda entry: (self.sketch.frequency(entry.key), entry.hits))
+            return [self._describe(entry, now) for entry in top]
+
+    def stats(self):
+        """获取命中、未命中、淘汰次数和字节占用"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self),
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'segments': {name: {'entries': len(segment), 'bytes': self._bytes[name]}
+                             for name, segment in self._segments.items()}
+            }
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线列式存储模块
+日K线以NumPy结构化数组保存: 价格为int32(单位: 分)，成交量int64，日期int32(YYYYMMDD)，
+每根K线28字节，并以.npy文件持久化到缓存目录，按需读入内存
+"""
+
+import itertools
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# 日K线结构化数组类型
+KLINE_DTYPE = np.dtype([
+    ('trade_date', '<i4'),  # YYYYMMDD
+    ('open', '<i4'),        # 分
+    ('high', '<i4'),
+    ('low', '<i4'),
+    ('close', '<i4'),
+    ('vol', '<i8')          # 股
+])
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+PRICE_SCALE = 100  # 元 -> 分
+
+# 序列版本号: 每个新建的序列（回补、合并、从磁盘加载）取一个递增的版本号
+_series_versions = itertools.count(1)
+
+
+def yuan_to_fen(values):
+    """将以元为单位的价格转换为整数分"""
+    return np.rint(np.asarray(values, dtype=np.float64) * PRICE_SCALE).astype(np.int32)
+
+
+def fen_to_yuan(values):
+    """将整数分转换为以元为单位的浮点价格"""
+    return np.asarray(values, dtype=np.float64) / PRICE_SCALE
+
+
+class KlineSeries:
+    """
+    单只股票的日K线序列，按交易日升序存储在结构化数组中
+    序列创建后不再修改，合并总是返回新序列，因此版本号相同即K线数据相同
+    """
+
+    __slots__ = ('ts_code', 'bars', 'version')
+
+    def __init__(self, ts_code, bars=None):
+        self.ts_code = ts_code
+        self.bars = bars if bars is not None else np.empty(0, dtype=KLINE_DTYPE)
+        self.version = next(_series_versions)
+
+    @classmethod
+    def from_records(cls, ts_code, records):
+        """从上游返回的K线字典列表构建序列（价格单位为元）"""
+        bars = np.empty(len(records), dtype=KLINE_DTYPE)
+        if len(records) > 0:
+            bars['trade_date'] = [int(record['trade_date']) for record in records]
+            for field in PRICE_FIELDS:
+                bars[field] = yuan_to_fen([record[field] for record in records])
+            bars['vol'] = [int(record['vol']) for record in records]
+            bars.sort(order='trade_date')
+        return cls(ts_code, bars)
+
+    def __len__(self):
+        return len(self.bars)
+
+    @property
+    def nbytes(self):
+        """序列占用的字节数"""
+        return self.bars.nbytes
+
+    @property
+    def first_date(self):
+        """最早交易日(YYYYMMDD整数)，空序列返回None"""
+        return int(self.bars['trade_date'][0]) if len(self.bars) else None
+
+    @property
+    def last_date(self):
+        """最新交易日(YYYYMMDD整数)，空序列返回None"""
+        return int(self.bars['trade_date'][-1]) if len(self.bars) else None
+
+    def merge(self, other):
+        """
+        合并另一段K线（通常是较新的增量数据或更早的回补数据）
+        同一交易日以other为准，返回新的序列
+        """
+        if len(other) == 0:
+            return self
+        if len(self) == 0:
+            return KlineSeries(self.ts_code, np.array(other.bars))
+
+        dates = other.bars['trade_date']
+        keep = ~np.isin(self.bars['trade_date'], dates)
+        merged = np.concatenate([self.bars[keep], other.bars])
+        merged.sort(kind='stable', order='trade_date')
+        return KlineSeries(self.ts_code, merged)
+
+    def window_start(self, days=None, start_date=None):
+        """计算窗口的起始下标: 最近days条，或start_date及之后"""
+        if start_date is not None:
+            return int(np.searchsorted(self.bars['trade_date'], int(start_date), side='left'))
+        if days is not None:
+            return max(len(self.bars) - days, 0)
+        return 0
+
+    def window_end(self, end_date=None):
+        """计算窗口的结束下标(不含)，end_date及之前"""
+        if end_date is None:
+            return len(self.bars)
+        return int(np.searchsorted(self.bars['trade_date'], int(end_date), side='right'))
+
+    def to_frame(self, start=0, end=None):
+        """
+        将[start, end)区间转换为DataFrame（价格单位为元）
+        昨收价取前一根K线的收盘价，序列第一根K线的昨收价设为开盘价
+        """
+        end = len(self.bars) if end is None else end
+        window = self.bars[start:end]
+
+        close = fen_to_yuan(window['close'])
+        pre_close = np.empty_like(close)
+        if len(window) > 0:
+            pre_close[1:] = close[:-1]
+            pre_close[0] = (fen_to_yuan(self.bars['close'][start - 1]) if start > 0
+                            else fen_to_yuan(window['open'][0]))
+
+        return pd.DataFrame({
+            'ts_code': self.ts_code,
+            'trade_date': window['trade_date'].astype(str),
+            'open': fen_to_yuan(window['open']),
+            'high': fen_to_yuan(window['high']),
+            'low': fen_to_yuan(window['low']),
+            'close': close,
+            'pre_close': pre_close,
+            'vol': window['vol'].astype(np.int64),
+            'amount': 0
+        }, columns=['ts_code', 'trade_date', 'open', 'high', 'low', 'close',
+                    'pre_close', 'vol', 'amount'])
+
+
+class KlineEntry:
+    """K线缓存条目: 序列及其获取状态"""
+
+    __slots__ = ('series', 'datalen', 'complete', 'fetched_at', 'stale')
+
+    def __init__(self, series, datalen, complete, fetched_at, stale=False):
+        self.series = series          # KlineSeries
+        self.datalen = datalen        # 已向上游请求的K线条数
+        self.complete = complete      # 上游已无更早的数据
+        self.fetched_at = fetched_at  # 获取时间(datetime)
+        self.stale = stale            # 来自过期数据兜底源（本地文件），需要从实时数据源重新获取
+
+    @property
+    def nbytes(self):
+        """条目占用的字节数（K线数组 + 条目自身的固定开销）"""
+        return self.series.nbytes + 256
+
+
+class KlineStore:
+    """K线序列的磁盘存储，每只股票一个.npy文件"""
+
+    def __init__(self, root):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+            print(f"创建K线存储目录: {root}")
+
+    def path_for(self, ts_code):
+        """股票对应的存储文件路径"""
+        return os.path.join(self.root, f"{ts_code}.npy")
+
+    def load(self, ts_code):
+        """
+        加载K线序列，返回(序列, 文件修改时间)；文件不存在或损坏时返回(None, None)
+        整个数组读入内存而不做内存映射，否则文件被映射期间（Windows上）无法被替换或删除
+        """
+        path = self.path_for(ts_code)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            bars = np.load(path)
+            if bars.dtype != KLINE_DTYPE:
+                print(f"K线存储文件格式不匹配，忽略: {path}")
+                return None, None
+            return KlineSeries(ts_code, bars), os.path.getmtime(path)
+        except Exception as e:
+            print(f"加载K线存储文件失败 {path}: {e}")
+            return None, None
+
+    def save(self, series):
+        """原子写入K线序列（先写唯一命名的临时文件再替换，并发保存同一股票时互不覆盖）"""
+        path = self.path_for(series.ts_code)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f"{series.ts_code}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(series.bars))
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"保存K线存储文件失败，本次更新未写入磁盘 {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def delete(self, ts_code):
+        """删除股票的存储文件"""
+        path = self.path_for(ts_code)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
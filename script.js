@@ -874,11 +874,38 @@ function handleStockClick(element) {
     showStockModal(stockCode, stockName);
 }
 
+// 日K数据本地缓存 - 刷新时只请求最后一根K线及之后的增量数据
+const dailyDataCache = new Map();
+
+// 将增量K线合并到已缓存的日K数据中
+function mergeDailyData(cached, delta) {
+    if (!cached) {
+        return delta;
+    }
+    
+    if (!delta.chart_data || delta.chart_data.length === 0) {
+        return { ...cached, data_type: delta.data_type, last_bar_provisional: delta.last_bar_provisional };
+    }
+    
+    // 同一交易日的K线以增量数据为准（最后一根K线可能是盘中临时数据）
+    const firstDate = delta.chart_data[0].date;
+    const chartData = cached.chart_data
+        .filter(bar => bar.date < firstDate)
+        .concat(delta.chart_data)
+        .slice(-Math.max(cached.chart_data.length, delta.chart_data.length));
+    
+    return { ...delta, chart_data: chartData };
+}
+
 // 获取股票数据
 async function fetchStockData(stockCode, type = 'daily') {
     try {
         const endpoint = type === 'daily' ? 'daily_data' : 'intraday_data';
-        const response = await fetch(`${API_BASE_URL}/${endpoint}/${stockCode}`, {
+        const cached = type === 'daily' ? dailyDataCache.get(stockCode) : null;
+        const lastBar = cached && cached.chart_data.length > 0 ? cached.chart_data[cached.chart_data.length - 1] : null;
+        const query = lastBar ? `?since=${lastBar.date.replace(/-/g, '')}` : '';
+        
+        const response = await fetch(`${API_BASE_URL}/${endpoint}/${stockCode}${query}`, {
             method: 'GET',
             mode: 'cors',
         });
@@ -888,6 +915,13 @@ async function fetchStockData(stockCode, type = 'daily') {
         }
         
         const data = await response.json();
+        
+        if (type === 'daily') {
+            const merged = mergeDailyData(cached, data);
+            dailyDataCache.set(stockCode, merged);
+            return merged;
+        }
+        
         return data;
         
     } catch (error) {
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+盘中行情快照归档模块
+每次市场快照以定长记录数组追加到按日存储的二进制文件中，记录以股票序号为键；
+支持帧间增量编码、内存映射读取（重启后恢复当日快照）以及按倍速回放
+"""
+
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+# 快照记录类型: 价格单位为分，成交量为股，成交额为元
+SNAPSHOT_DTYPE = np.dtype([
+    ('sym', '<u2'),
+    ('close', '<i4'),
+    ('pre_close', '<i4'),
+    ('open', '<i4'),
+    ('high', '<i4'),
+    ('low', '<i4'),
+    ('vol', '<i8'),
+    ('amount', '<i8')
+])
+VALUE_FIELDS = ('close', 'pre_close', 'open', 'high', 'low', 'vol', 'amount')
+PRICE_SCALE = 100  # 元 -> 分
+
+# 帧头: 魔数、标志位、时间戳(毫秒)、记录数
+FRAME_HEADER = struct.Struct('<4sB3xqI4x')
+FRAME_MAGIC = b'SNAP'
+FLAG_DELTA = 1
+
+# 股票序号上限(uint16)
+MAX_SYMBOLS = np.iinfo(np.uint16).max
+
+
+def _day_paths(root, day):
+    """返回某日的帧文件和股票序号文件路径"""
+    return (os.path.join(root, f"{day}.bin"), os.path.join(root, f"{day}.symbols"))
+
+
+def quotes_to_records(quotes, symbol_index):
+    """
+    将行情字典(ts_code -> quote)转换为快照记录数组
+    symbol_index为ts_code -> 序号的映射，新出现的股票会追加到映射中
+    """
+    records = np.zeros(len(quotes), dtype=SNAPSHOT_DTYPE)
+    for row, (ts_code, quote) in enumerate(quotes.items()):
+        sym = symbol_index.get(ts_code)
+        if sym is None:
+            sym = len(symbol_index)
+            if sym >= MAX_SYMBOLS:
+                raise ValueError("快照归档的股票数量超出上限")
+            symbol_index[ts_code] = sym
+        records[row] = (
+            sym,
+            round(quote['close'] * PRICE_SCALE),
+            round(quote['pre_close'] * PRICE_SCALE),
+            round(quote['open'] * PRICE_SCALE),
+            round(quote['high'] * PRICE_SCALE),
+            round(quote['low'] * PRICE_SCALE),
+            int(quote['vol']),
+            int(quote['amount'])
+        )
+    records.sort(order='sym')
+    return records
+
+
+def records_to_quotes(records, symbols, trade_date):
+    """将快照记录数组转换回行情字典，格式与StockDataCache.daily_quotes一致"""
+    quotes = {}
+    close = records['close'] / PRICE_SCALE
+    pre_close = records['pre_close'] / PRICE_SCALE
+    change = np.round(close - pre_close, 2)
+    pct_chg = np.round(np.divide(change * 100, pre_close, out=np.zeros_like(change),
+                                 where=pre_close > 0), 2)
+    open_ = records['open'] / PRICE_SCALE
+    high = records['high'] / PRICE_SCALE
+    low = records['low'] / PRICE_SCALE
+
+    for i, sym in enumerate(records['sym']):
+        quotes[symbols[sym]] = {
+            'trade_date': trade_date,
+            'close': float(close[i]),
+            'pre_close': float(pre_close[i]),
+            'change': float(change[i]),
+            'pct_chg': float(pct_chg[i]),
+            'open': float(open_[i]),
+            'high': float(high[i]),
+            'low': float(low[i]),
+            'vol': float(records['vol'][i]),
+            'amount': float(records['amount'][i])
+        }
+    return quotes
+
+
+class SnapshotArchiveReader:
+    """以内存映射方式读取某日的快照归档"""
+
+    def __init__(self, root, day):
+        self.day = day
+        self.frame_path, self.symbols_path = _day_paths(root, day)
+        self.symbols = []
+        self.valid_bytes = 0
+
+        if os.path.exists(self.symbols_path):
+            with open(self.symbols_path, 'r', encoding='utf-8') as f:
+                self.symbols = [line.strip() for line in f if line.strip()]
+
+    def exists(self):
+        """归档文件是否存在"""
+        return os.path.exists(self.frame_path) and os.path.getsize(self.frame_path) > 0
+
+    def iter_frames(self):
+        """
+        依次返回(时间戳datetime, 当前完整快照记录数组)
+        增量帧会与之前的状态合并；文件末尾写了一半的帧会被忽略
+        """
+        if not self.exists():
+            return
+
+        data = np.memmap(self.frame_path, dtype=np.uint8, mode='r')
+        state = np.zeros(max(len(self.symbols), 1), dtype=SNAPSHOT_DTYPE)
+        present = np.zeros(len(state), dtype=bool)
+        offset = 0
+        size = len(data)
+
+        while offset + FRAME_HEADER.size <= size:
+            magic, flags, ts_ms, count = FRAME_HEADER.unpack_from(data, offset)
+            body_start = offset + FRAME_HEADER.size
+            body_end = body_start + count * SNAPSHOT_DTYPE.itemsize
+            if magic != FRAME_MAGIC or body_end > size:
+                print(f"快照归档 {self.frame_path} 在偏移 {offset} 处不完整，忽略后续数据")
+                break
+
+            records = np.frombuffer(data, dtype=SNAPSHOT_DTYPE, count=count, offset=body_start)
+            if len(records) and records['sym'].max() >= len(state):
+                print(f"快照归档 {self.frame_path} 引用了未知的股票序号，忽略后续数据")
+                break
+
+            syms = records['sym']
+            if not flags & FLAG_DELTA:
+                present[:] = False
+                state[syms] = records
+            else:
+                for field in VALUE_FIELDS:
+                    state[field][syms] += records[field]
+                state['sym'][syms] = syms
+            present[syms] = True
+
+            offset = body_end
+            self.valid_bytes = offset
+            yield datetime.fromtimestamp(ts_ms / 1000), state[present]
+
+    def latest(self):
+        """返回最后一帧的(时间戳, 快照记录数组)，没有数据时返回(None, None)"""
+        latest = (None, None)
+        for timestamp, records in self.iter_frames():
+            latest = (timestamp, records)
+        return latest
+
+    def to_quotes(self, records):
+        """将快照记录数组转换为行情字典"""
+        return records_to_quotes(records, self.symbols, self.day)
+
+
+class SnapshotArchiveWriter:
+    """按日追加写入快照归档，跨日时自动切换文件；append可被多个线程调用，帧按调用顺序串行写入"""
+
+    def __init__(self, root, delta=True, keyframe_interval=60):
+        self.root = root
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.day = None
+        self.symbol_index = {}
+        self.state = None  # 上一帧后的完整状态，按股票序号索引
+        self.frames_since_keyframe = 0
+        # 增量帧以上一帧的状态为基准，编码和写入必须串行
+        self._lock = threading.Lock()
+
+        if not os.path.exists(root):
+            os.makedirs(root)
+            print(f"创建快照归档目录: {root}")
+
+    def _open_day(self, day):
+        """切换到某日的归档文件，已存在时恢复序号映射和增量编码状态"""
+        self.day = day
+        self.symbol_index = {}
+        self.state = None
+        self.frames_since_keyframe = 0
+
+        reader = SnapshotArchiveReader(self.root, day)
+        self.symbol_index = {ts_code: i for i, ts_code in enumerate(reader.symbols)}
+        _, records = reader.latest()
+        if records is not None:
+            self.state = np.zeros(len(reader.symbols), dtype=SNAPSHOT_DTYPE)
+            self.state[records['sym']] = records
+            # 帧数未知，下一帧写关键帧
+            self.frames_since_keyframe = self.keyframe_interval
+
+        # 截掉异常退出时写了一半的帧
+        if os.path.exists(reader.frame_path) and os.path.getsize(reader.frame_path) > reader.valid_bytes:
+            with open(reader.frame_path, 'r+b') as f:
+                f.truncate(reader.valid_bytes)
+
+    def append(self, timestamp, quotes):
+        """追加一帧快照，返回写入的字节数"""
+        with self._lock:
+            return self._append(timestamp, quotes)
+
+    def _append(self, timestamp, quotes):
+        day = timestamp.strftime('%Y%m%d')
+        if day != self.day:
+            self._open_day(day)
+
+        known = len(self.symbol_index)
+        records = quotes_to_records(quotes, self.symbol_index)
+        frame_path, symbols_path = _day_paths(self.root, day)
+
+        # 先写入新股票的序号，保证读取方不会遇到未知序号
+        if len(self.symbol_index) > known:
+            new_symbols = sorted(self.symbol_index, key=self.symbol_index.get)[known:]
+            with open(symbols_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{ts_code}\n" for ts_code in new_symbols))
+
+        state = np.zeros(len(self.symbol_index), dtype=SNAPSHOT_DTYPE)
+        if self.state is not None:
+            state[:len(self.state)] = self.state
+        current = state.copy()
+        current[records['sym']] = records
+
+        flags = 0
+        body = records
+        if self.delta and self.state is not None and self.frames_since_keyframe < self.keyframe_interval:
+            # 增量帧: 只写发生变化的股票，数值为与上一帧的差
+            syms = records['sym']
+            diff = np.zeros(len(records), dtype=SNAPSHOT_DTYPE)
+            diff['sym'] = syms
+            changed = np.zeros(len(records), dtype=bool)
+            for field in VALUE_FIELDS:
+                diff[field] = records[field] - state[field][syms]
+                changed |= diff[field] != 0
+            body = diff[changed]
+            flags = FLAG_DELTA
+            self.frames_since_keyframe += 1
+        else:
+            self.frames_since_keyframe = 0
+
+        header = FRAME_HEADER.pack(FRAME_MAGIC, flags, int(timestamp.timestamp() * 1000), len(body))
+        with open(frame_path, 'ab') as f:
+            f.write(header + body.tobytes())
+
+        self.state = current
+        return FRAME_HEADER.size + body.nbytes
+
+
+def replay(cache, root, day, speed=10.0):
+    """
+    按speed倍速回放某日的快照归档，依次调用cache.apply_quote_snapshot
+    用于离线测试；speed<=0时不等待
+    """
+    reader = SnapshotArchiveReader(root, day)
+    if not reader.exists():
+        print(f"未找到 {day} 的快照归档")
+        return 0
+
+    print(f"开始回放 {day} 的快照归档，倍速: {speed}")
+    previous = None
+    frames = 0
+    for timestamp, records in reader.iter_frames():
+        if previous is not None and speed > 0:
+            time.sleep(max((timestamp - previous).total_seconds() / speed, 0))
+        previous = timestamp
+        cache.apply_quote_snapshot(reader.to_quotes(records), timestamp)
+        frames += 1
+
+    print(f"{day} 的快照归档回放完成，共 {frames} 帧")
+    return frames
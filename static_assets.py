@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端静态资源模块
+启动时一次性处理index.html、script.js、style.css: 压缩空白、预先gzip/brotli压缩、
+生成带内容哈希的文件名并改写index.html中的引用，之后全部从内存提供服务
+"""
+
+import gzip
+import hashlib
+import os
+import re
+from flask import Response
+from stock_codec import brotli, negotiate_encoding
+
+# 可选依赖 - 未安装时JS不做压缩，CSS使用内置的简单压缩
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+# 静态资源配置
+STATIC_ASSET_CONFIG = {
+    'index': 'index.html',
+    'fingerprinted': ['script.js', 'style.css'],  # 需要生成哈希文件名的资源
+    'hash_length': 10,
+    'immutable_max_age': 31536000  # 带哈希文件名的资源缓存一年
+}
+
+MIME_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8'
+}
+
+
+def minify_css(text):
+    """压缩CSS: 去除注释和多余空白"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """压缩JS: 依赖rjsmin，未安装时原样返回（只做预压缩）"""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+def minify_html(text):
+    """压缩HTML: 去除每行首尾空白和空行"""
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+class StaticAsset:
+    """单个静态资源的各编码版本"""
+
+    __slots__ = ('name', 'mimetype', 'bodies', 'etag', 'immutable')
+
+    def __init__(self, name, content, immutable):
+        self.name = name
+        self.mimetype = MIME_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.immutable = immutable
+        self.etag = hashlib.sha256(content).hexdigest()[:16]
+        self.bodies = {None: content, 'gzip': gzip.compress(content, compresslevel=9)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(content, quality=11)
+
+
+class StaticAssetBundle:
+    """启动时构建的静态资源集合，只提供已知资源"""
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        self.build()
+
+    def _read(self, name):
+        with open(os.path.join(self.root, name), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def build(self):
+        """读取、压缩并生成带哈希文件名的资源"""
+        assets = {}
+        renamed = {}
+
+        for name in STATIC_ASSET_CONFIG['fingerprinted']:
+            text = self._read(name)
+            text = minify_js(text) if name.endswith('.js') else minify_css(text)
+            content = text.encode('utf-8')
+
+            digest = hashlib.sha256(content).hexdigest()[:STATIC_ASSET_CONFIG['hash_length']]
+            base, ext = os.path.splitext(name)
+            hashed_name = f"{base}.{digest}{ext}"
+            renamed[name] = hashed_name
+
+            assets[hashed_name] = StaticAsset(hashed_name, content, immutable=True)
+            # 保留原文件名，兼容旧页面，但不做长期缓存
+            assets[name] = StaticAsset(name, content, immutable=False)
+
+        index_name = STATIC_ASSET_CONFIG['index']
+        index_html = self._read(index_name)
+        for name, hashed_name in renamed.items():
+            index_html = re.sub(rf'''(\b(?:href|src)=["']){re.escape(name)}(["'])''',
+                                rf'\g<1>{hashed_name}\g<2>', index_html)
+        assets[index_name] = StaticAsset(index_name, minify_html(index_html).encode('utf-8'),
+                                         immutable=False)
+
+        self.assets = assets
+        for name, hashed_name in renamed.items():
+            asset = assets[hashed_name]
+            sizes = ', '.join(f"{encoding or 'raw'}={len(body)}" for encoding, body in asset.bodies.items())
+            print(f"静态资源 {name} -> {hashed_name} ({sizes})")
+
+    def response_for(self, name, request):
+        """为已知资源构建响应，未知资源返回None"""
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        if asset.immutable:
+            cache_control = f"public, max-age={STATIC_ASSET_CONFIG['immutable_max_age']}, immutable"
+        else:
+            cache_control = 'no-cache'
+
+        etag = f'"{asset.etag}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=304)
+        else:
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+            if encoding not in asset.bodies:
+                encoding = None
+            response = Response(asset.bodies[encoding], mimetype=asset.mimetype.split(';')[0])
+            response.headers['Content-Type'] = asset.mimetype
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
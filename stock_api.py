@@ -5,10 +5,15 @@
 包含所有股票相关的Flask路由处理函数
 """
 
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from stock_data import API_CONFIG, STOCK_LIST_CACHE_FILE
+from stock_codec import build_response
+from stock_compare import compare_series
+from stock_backtest import BACKTEST_CONFIG, STRATEGIES, parameter_grid, run_backtest, warmup_bars
+from stock_export import EXPORT_CONFIG, iter_csv, iter_parquet, pq
 
 
 def setup_stock_routes(app, cache):
@@ -35,37 +40,42 @@ def setup_stock_routes(app, cache):
                 print("股票列表未加载")
                 return jsonify({'error': '股票列表未加载'}), 500
             
-            # 获取所有股票映射
-            mappings = cache.get_all_stock_mappings()
-            
-            # 返回股票代码和名称列表
-            stock_codes = []
-            stock_names = []
-            
-            for _, row in cache.stock_list.iterrows():
-                stock_codes.append({
-                    'code': row['symbol'],
-                    'ts_code': row['ts_code'],
-                    'name': row['name'],
-                    'market': row['market']
-                })
-                stock_names.append({
-                    'name': row['name'],
-                    'ts_code': row['ts_code'],
-                    'symbol': row['symbol'],
-                    'market': row['market']
-                })
-            
-            result = {
-                'codes': stock_codes,
-                'names': stock_names,
-                'mappings': mappings,
-                'total': len(cache.stock_list)
-            }
+            def build_stock_list_payload():
+                # 获取所有股票映射
+                mappings = cache.get_all_stock_mappings()
+                
+                # 返回股票代码和名称列表
+                stock_codes = []
+                stock_names = []
+                
+                for _, row in cache.stock_list.iterrows():
+                    stock_codes.append({
+                        'code': row['symbol'],
+                        'ts_code': row['ts_code'],
+                        'name': row['name'],
+                        'market': row['market']
+                    })
+                    stock_names.append({
+                        'name': row['name'],
+                        'ts_code': row['ts_code'],
+                        'symbol': row['symbol'],
+                        'market': row['market']
+                    })
+                
+                return {
+                    'codes': stock_codes,
+                    'names': stock_names,
+                    'mappings': mappings,
+                    'total': len(cache.stock_list)
+                }
             
             print(f"返回股票数据，共 {len(cache.stock_list)} 只股票")
             
-            response = jsonify(result)
+            # 股票列表更新后版本号变化，缓存的响应体自动失效
+            response = build_response(request, build_stock_list_payload,
+                                      body_cache=cache.encoded_bodies,
+                                      cache_key='stock_list',
+                                      fingerprint=cache.stock_list_version)
             response.headers.add('Access-Control-Allow-Origin', '*')
             response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
             response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
@@ -121,53 +131,316 @@ def setup_stock_routes(app, cache):
             
             # 获取参数
             days = request.args.get('days', API_CONFIG['default_days'], type=int)  # 默认获取60天数据
+            since = request.args.get('since', '').replace('-', '') or None  # 增量请求的起始交易日
+            start_date = request.args.get('start', '').replace('-', '') or None  # 区间起始日期
+            end_date = request.args.get('end', '').replace('-', '') or None  # 区间结束日期
+            for name, value in (('since', since), ('start', start_date), ('end', end_date)):
+                if value and not (len(value) == 8 and value.isdigit()):
+                    return jsonify({'error': f'无效的{name}参数: {value}'}), 400
             
             # 获取日K线数据
-            daily_data = cache.get_daily_data(ts_code, days)
+            daily_data = cache.get_daily_data(ts_code, days, since=since,
+                                              start_date=start_date, end_date=end_date)
             
-            if daily_data is None or daily_data.empty:
+            if daily_data is None or (daily_data.empty and not since):
                 return jsonify({'error': '未获取到历史数据'}), 404
             
-            # 转换数据格式
-            chart_data = []
-            for _, row in daily_data.iterrows():
-                chart_data.append({
-                    'date': f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}",
-                    'open': float(row['open']),
-                    'high': float(row['high']),
-                    'low': float(row['low']),
-                    'close': float(row['close']),
-                    'volume': int(row['vol']) if pd.notna(row['vol']) else 0
-                })
+            # 判断数据类型
+            current_time = datetime.now()
+            is_trading_time = cache.is_trading_time(current_time)
+            data_type = 'realtime' if is_trading_time else 'historical'
+            
+            # 过期数据已先返回，后台正在刷新
+            stale = bool(daily_data.attrs.get('stale', False))
+            
+            # 交易时间内当日K线尚未收盘，标记为临时数据
+            last_bar_provisional = bool(
+                is_trading_time and not daily_data.empty and
+                daily_data.iloc[-1]['trade_date'] == current_time.strftime('%Y%m%d'))
+            
+            def build_daily_payload():
+                # 转换数据格式
+                chart_data = []
+                for _, row in daily_data.iterrows():
+                    chart_data.append({
+                        'date': f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}",
+                        'open': float(row['open']),
+                        'high': float(row['high']),
+                        'low': float(row['low']),
+                        'close': float(row['close']),
+                        'volume': int(row['vol']) if pd.notna(row['vol']) else 0
+                    })
+                
+                # 计算当前价格和涨跌幅
+                if len(chart_data) >= 1:
+                    current_price = chart_data[-1]['close']
+                    # 使用当日的pre_close计算涨跌幅
+                    pre_close = float(daily_data.iloc[-1]['pre_close'])
+                    change_percent = ((current_price - pre_close) / pre_close * 100)
+                else:
+                    current_price = 0
+                    change_percent = 0
+                
+                return {
+                    'current_price': round(current_price, 2),
+                    'change_percent': round(change_percent, 2),
+                    'volume': chart_data[-1]['volume'] if chart_data else 0,
+                    'chart_data': chart_data,
+                    'data_type': data_type,
+                    'since': since,
+                    'last_bar_provisional': last_bar_provisional,
+                    'stale': stale
+                }
+            
+            # 同一股票同一窗口的数据未变化时直接复用已编码的响应体
+            response = build_response(request, build_daily_payload,
+                                      columns_key='chart_data',
+                                      body_cache=cache.encoded_bodies,
+                                      cache_key=('daily_data', ts_code, days, since, start_date, end_date),
+                                      fingerprint=(cache.daily_data_fingerprint(daily_data), data_type,
+                                                   last_bar_provisional, stale))
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+            
+        except Exception as e:
+            print(f"获取日K线数据失败: {e}")
+            import traceback
+            traceback.print_exc()
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/compare', methods=['GET', 'OPTIONS'])
+    def compare_stocks():
+        """多股票对比 - 按交易日对齐的归一化收盘价和收益率相关系数矩阵"""
+        if request.method == 'OPTIONS':
+            return '', 200
+            
+        try:
+            codes = [code.strip() for code in request.args.get('codes', '').split(',') if code.strip()]
+            days = request.args.get('days', API_CONFIG['default_days'], type=int)
+            
+            if len(codes) < 2:
+                return jsonify({'error': '至少需要两只股票进行对比'}), 400
+            if len(codes) > API_CONFIG['compare_limit']:
+                return jsonify({'error': f"最多支持 {API_CONFIG['compare_limit']} 只股票对比"}), 400
+            if days <= 1:
+                return jsonify({'error': f'无效的days参数: {days}'}), 400
+            
+            ts_codes = []
+            for code in codes:
+                ts_code = cache.get_stock_ts_code(code)
+                if not ts_code:
+                    return jsonify({'error': f'未找到股票代码: {code}'}), 404
+                ts_codes.append(ts_code)
+            ts_codes = list(dict.fromkeys(ts_codes))
+            
+            # 并行获取（命中缓存时直接返回）各股票的K线列数组
+            series_list = cache.get_kline_series_many(ts_codes, days)
+            missing = [ts_code for ts_code, series in zip(ts_codes, series_list) if series is None]
+            if missing:
+                return jsonify({'error': f"未获取到历史数据: {', '.join(missing)}"}), 404
+            
+            result = compare_series(series_list, days)
+            
+            def to_list(values):
+                # NaN转换为None，便于JSON序列化
+                return [None if np.isnan(value) else round(float(value), 4) for value in values]
+            
+            payload = {
+                'dates': [f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}"
+                          for date in result['dates'].tolist()],
+                'series': [
+                    {
+                        'ts_code': ts_code,
+                        'name': cache.stock_dict.get(ts_code, {}).get('name', ts_code),
+                        'rebased': to_list(rebased),
+                        'suspended_days': int(suspended.sum())
+                    }
+                    for ts_code, rebased, suspended in zip(ts_codes, result['rebased'], result['suspended'])
+                ],
+                'correlation': {
+                    'codes': ts_codes,
+                    'matrix': [to_list(row) for row in result['correlation']]
+                }
+            }
+            
+            response = build_response(request, payload)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
             
-            # 计算当前价格和涨跌幅
-            if len(chart_data) >= 1:
-                current_price = chart_data[-1]['close']
-                # 使用当日的pre_close计算涨跌幅
-                pre_close = float(daily_data.iloc[-1]['pre_close'])
-                change_percent = ((current_price - pre_close) / pre_close * 100)
+        except Exception as e:
+            print(f"股票对比失败: {e}")
+            import traceback
+            traceback.print_exc()
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/export', methods=['GET', 'OPTIONS'])
+    def export_history():
+        """批量导出历史K线 - 流式输出CSV或Parquet"""
+        if request.method == 'OPTIONS':
+            return '', 200
+            
+        try:
+            codes = [code.strip() for code in request.args.get('codes', '').split(',') if code.strip()]
+            board = request.args.get('board', '').strip()
+            fmt = request.args.get('format', 'csv').lower()
+            days = request.args.get('days', API_CONFIG['default_days'], type=int)
+            start_date = request.args.get('start', '').replace('-', '') or None
+            end_date = request.args.get('end', '').replace('-', '') or None
+            for name, value in (('start', start_date), ('end', end_date)):
+                if value and not (len(value) == 8 and value.isdigit()):
+                    return jsonify({'error': f'无效的{name}参数: {value}'}), 400
+            
+            if fmt not in ('csv', 'parquet'):
+                return jsonify({'error': f'不支持的导出格式: {fmt}'}), 400
+            if fmt == 'parquet' and pq is None:
+                return jsonify({'error': '服务端未安装pyarrow，无法导出Parquet'}), 501
+            
+            # 股票列表: 显式指定的代码优先，其次按板块筛选
+            if codes:
+                ts_codes = []
+                for code in codes:
+                    ts_code = cache.get_stock_ts_code(code)
+                    if not ts_code:
+                        return jsonify({'error': f'未找到股票代码: {code}'}), 404
+                    ts_codes.append(ts_code)
+            elif board:
+                ts_codes = cache.get_board_ts_codes(board)
+                if not ts_codes:
+                    return jsonify({'error': f'未找到板块: {board}'}), 404
             else:
-                current_price = 0
-                change_percent = 0
+                return jsonify({'error': '需要指定codes或board参数'}), 400
             
-            # 判断数据类型
-            current_time = datetime.now().time()
-            is_trading_time = cache.is_trading_time(current_time)
+            ts_codes = list(dict.fromkeys(ts_codes))
+            if len(ts_codes) > EXPORT_CONFIG['max_symbols']:
+                return jsonify({'error': f"单次最多导出 {EXPORT_CONFIG['max_symbols']} 只股票"}), 400
+            
+            print(f"开始导出 {len(ts_codes)} 只股票的历史数据，格式: {fmt}")
+            window = {'days': None if start_date else days, 'start_date': start_date, 'end_date': end_date}
+            if fmt == 'csv':
+                body = iter_csv(cache, ts_codes, **window)
+                mimetype = 'text/csv'
+            else:
+                body = iter_parquet(cache, ts_codes, **window)
+                mimetype = 'application/vnd.apache.parquet'
+            
+            response = Response(stream_with_context(body), mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename=kline_export.{fmt}'
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+            
+        except Exception as e:
+            print(f"导出历史数据失败: {e}")
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 500
+
+    @app.route('/api/backtest', methods=['GET', 'OPTIONS'])
+    def backtest():
+        """向量化回测 - 单只股票或整个板块上的均线交叉、突破、动量轮动策略及参数扫描"""
+        if request.method == 'OPTIONS':
+            return '', 200
             
-            result = {
-                'current_price': round(current_price, 2),
-                'change_percent': round(change_percent, 2),
-                'volume': chart_data[-1]['volume'] if chart_data else 0,
-                'chart_data': chart_data,
-                'data_type': 'realtime' if is_trading_time else 'historical'
+        try:
+            codes = [code.strip() for code in request.args.get('codes', '').split(',') if code.strip()]
+            board = request.args.get('board', '').strip()
+            strategy = request.args.get('strategy', 'ma_cross')
+            days = request.args.get('days', BACKTEST_CONFIG['default_days'], type=int)
+            fee_bps = request.args.get('fee_bps', 0.0, type=float)
+            
+            if strategy not in STRATEGIES:
+                return jsonify({'error': f'不支持的策略: {strategy}'}), 400
+            if days <= 1 or days > BACKTEST_CONFIG['max_days']:
+                return jsonify({'error': f'无效的days参数: {days}'}), 400
+            
+            # 策略参数: 逗号分隔的多个取值表示参数扫描，例如 fast=5,10&slow=20,60
+            params = {}
+            for name in STRATEGIES[strategy]:
+                values = [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+                if not all(value.isdigit() for value in values):
+                    return jsonify({'error': f'无效的{name}参数: {request.args.get(name)}'}), 400
+                params[name] = [int(value) for value in values]
+            
+            # 股票列表: 显式指定的代码优先，其次按板块筛选
+            if codes:
+                ts_codes = []
+                for code in codes:
+                    ts_code = cache.get_stock_ts_code(code)
+                    if not ts_code:
+                        return jsonify({'error': f'未找到股票代码: {code}'}), 404
+                    ts_codes.append(ts_code)
+            elif board:
+                ts_codes = cache.get_board_ts_codes(board)
+                if not ts_codes:
+                    return jsonify({'error': f'未找到板块: {board}'}), 404
+            else:
+                return jsonify({'error': '需要指定codes或board参数'}), 400
+            
+            ts_codes = list(dict.fromkeys(ts_codes))
+            if len(ts_codes) > BACKTEST_CONFIG['max_symbols']:
+                return jsonify({'error': f"单次最多回测 {BACKTEST_CONFIG['max_symbols']} 只股票"}), 400
+            
+            # 额外获取预热期的K线，用于计算评估区间开始时的均线/突破/动量信号
+            combos = parameter_grid(strategy, params)
+            if not combos:
+                return jsonify({'error': '没有有效的参数组合'}), 400
+            fetch_days = days + warmup_bars(strategy, combos)
+            series_list = cache.get_kline_series_many(ts_codes, fetch_days)
+            loaded = [(ts_code, series) for ts_code, series in zip(ts_codes, series_list) if series is not None]
+            if not loaded:
+                return jsonify({'error': '未获取到历史数据'}), 404
+            ts_codes = [ts_code for ts_code, _ in loaded]
+            
+            print(f"开始回测 {strategy}，{len(ts_codes)} 只股票，{days} 个交易日")
+            dates, results = run_backtest([series for _, series in loaded], strategy, params, days, fee_bps)
+            
+            def format_result(result):
+                item = {
+                    'params': result['params'],
+                    'summary': result['summary'],
+                    'equity': np.round(result['equity'], 4).tolist()
+                }
+                if 'holdings' in result:
+                    item['rebalances'] = result['rebalances']
+                    item['holdings'] = [ts_codes[index] for index in result['holdings'].tolist()]
+                elif len(results) == 1:
+                    # 单个参数组合时附带各股票的统计
+                    symbols = result['symbols']
+                    item['symbols'] = [
+                        {
+                            'ts_code': ts_code,
+                            'total_return': round(float(total), 6),
+                            'max_drawdown': round(float(drawdown), 6),
+                            'trades': int(trades)
+                        }
+                        for ts_code, total, drawdown, trades in zip(
+                            ts_codes, symbols['total_return'], symbols['max_drawdown'], symbols['trades'])
+                    ]
+                return item
+            
+            payload = {
+                'strategy': strategy,
+                'symbols': len(ts_codes),
+                'missing': len(series_list) - len(ts_codes),
+                'fee_bps': fee_bps,
+                'dates': [f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}"
+                          for date in dates.tolist()],
+                'results': [format_result(result) for result in results]
             }
             
-            response = jsonify(result)
+            response = build_response(request, payload)
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response
             
+        except ValueError as e:
+            error_response = jsonify({'error': str(e)})
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 400
         except Exception as e:
-            print(f"获取日K线数据失败: {e}")
+            print(f"回测失败: {e}")
             import traceback
             traceback.print_exc()
             error_response = jsonify({'error': str(e)})
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量化回测模块
+在对齐后的价格矩阵[股票, 日期]上用NumPy数组运算计算信号、持仓和收益，不逐K线循环；
+单股票策略（均线交叉、突破）按股票分块在线程池中并行（NumPy数组运算期间释放GIL），N日动量轮动在截面上整体计算。
+信号在当日收盘后产生，次日起持仓；全部股票等权分配资金
+"""
+
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from stock_compare import align_fields
+
+# 回测配置
+BACKTEST_CONFIG = {
+    'workers': max((os.cpu_count() or 2) - 1, 1),  # 回测线程数
+    'parallel_min_symbols': 200,  # 股票数超过该值时才使用线程池
+    'chunk_symbols': 250,         # 每个线程任务处理的股票数
+    'max_symbols': 6000,          # 单次回测的股票数量上限
+    'max_combinations': 200,      # 参数扫描的组合数上限
+    'default_days': 250,          # 默认回测区间（交易日）
+    'max_days': 5000,             # 回测区间的交易日上限
+    'trading_days_per_year': 252
+}
+
+# 各策略的参数及默认值；参数可以是列表，按笛卡尔积做参数扫描
+STRATEGIES = {
+    'ma_cross': {'fast': [5], 'slow': [20]},                       # 快线在慢线上方时持有
+    'breakout': {'entry': [20], 'exit': [10]},                     # 突破entry日最高价买入，跌破exit日最低价卖出
+    'momentum': {'lookback': [20], 'top': [10], 'rebalance': [5]}  # 每rebalance日持有lookback日涨幅最高的top只
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    延迟创建回测线程池
+    不使用进程池: 在多线程的Flask服务中fork可能死锁，Windows上的spawn又会在子进程中重新导入backend.py
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=BACKTEST_CONFIG['workers'], thread_name_prefix='backtest')
+        return _pool
+
+
+def parameter_grid(strategy, params):
+    """展开参数扫描的组合，params中未给出的参数使用默认值，不合理的组合被跳过"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f'不支持的策略: {strategy}')
+
+    names = list(STRATEGIES[strategy])
+    values = [[int(value) for value in params.get(name) or STRATEGIES[strategy][name]] for name in names]
+    combos = []
+    for combo in itertools.product(*values):
+        combo = dict(zip(names, combo))
+        if any(value <= 0 for value in combo.values()):
+            continue
+        if strategy == 'ma_cross' and combo['fast'] >= combo['slow']:
+            continue
+        combos.append(combo)
+
+    if len(combos) > BACKTEST_CONFIG['max_combinations']:
+        raise ValueError(f"参数组合最多 {BACKTEST_CONFIG['max_combinations']} 个")
+    return combos
+
+
+def warmup_bars(strategy, combos):
+    """计算信号所需的额外历史K线数"""
+    if strategy == 'ma_cross':
+        return max(combo['slow'] for combo in combos)
+    if strategy == 'breakout':
+        return max(max(combo['entry'], combo['exit']) for combo in combos) + 1
+    return max(combo['lookback'] for combo in combos) + 1
+
+
+# =============================================================================
+# 数组工具
+# =============================================================================
+def rolling_mean(values, window):
+    """沿日期轴的滚动均值（累加和差分），窗口内有缺失数据或窗口不足的位置为NaN"""
+    result = np.full(values.shape, np.nan)
+    if window > values.shape[1]:
+        return result
+    valid = ~np.isnan(values)
+    padding = np.zeros((len(values), 1))
+    csum = np.cumsum(np.concatenate([padding, np.where(valid, values, 0.0)], axis=1), axis=1)
+    ccount = np.cumsum(np.concatenate([padding, valid], axis=1), axis=1)
+    full = (ccount[:, window:] - ccount[:, :-window]) == window
+    result[:, window - 1:] = np.where(full, (csum[:, window:] - csum[:, :-window]) / window, np.nan)
+    return result
+
+
+def rolling_extreme(values, window, func=np.maximum):
+    """
+    沿日期轴的滚动最大/最小值，窗口包含当日，窗口不足的位置为NaN
+    按窗口长度倍增合并（稀疏表），复杂度O(N·log window)
+    """
+    length = values.shape[1]
+    result = np.full(values.shape, np.nan)
+    if window > length:
+        return result
+
+    span = 1
+    table = values
+    while span * 2 <= window:
+        table = func(table[:, :-span], table[:, span:])
+        span *= 2
+    # table[:, i] 为 [i, i+span) 区间的极值，两个重叠区间覆盖整个窗口
+    count = length - window + 1
+    result[:, window - 1:] = func(table[:, :count], table[:, window - span:window - span + count])
+    return result
+
+
+def forward_fill(values):
+    """沿日期轴前向填充NaN"""
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(len(values))[:, None], index]
+
+
+def daily_returns(closes):
+    """日收益率矩阵，与closes同形状，第一列及缺失数据为0"""
+    returns = np.zeros(closes.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1.0
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+def summarize(returns):
+    """由日收益率序列计算汇总指标"""
+    days_per_year = BACKTEST_CONFIG['trading_days_per_year']
+    if len(returns) == 0:
+        return {'total_return': 0.0, 'annual_return': 0.0, 'volatility': 0.0,
+                'sharpe': 0.0, 'max_drawdown': 0.0}
+
+    equity = np.cumprod(1.0 + returns)
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+    std = returns.std()
+    annual = equity[-1] ** (days_per_year / len(returns)) - 1.0 if equity[-1] > 0 else -1.0
+    return {
+        'total_return': round(float(equity[-1] - 1.0), 6),
+        'annual_return': round(float(annual), 6),
+        'volatility': round(float(std * np.sqrt(days_per_year)), 6),
+        'sharpe': round(float(returns.mean() / std * np.sqrt(days_per_year)), 4) if std > 0 else 0.0,
+        'max_drawdown': round(float(drawdown.min()), 6)
+    }
+
+
+# =============================================================================
+# 策略
+# =============================================================================
+def ma_cross_positions(closes, fast, slow):
+    """快速均线在慢速均线上方时持仓1，否则0"""
+    with np.errstate(invalid='ignore'):
+        return (rolling_mean(closes, fast) > rolling_mean(closes, slow)).astype(float)
+
+
+def breakout_positions(closes, highs, lows, entry, exit_days):
+    """收盘价突破前entry日最高价时买入，跌破前exit日最低价时卖出，其余时间保持原状态"""
+    prior_high = np.full(highs.shape, np.nan)
+    prior_low = np.full(lows.shape, np.nan)
+    prior_high[:, 1:] = rolling_extreme(highs, entry, np.maximum)[:, :-1]
+    prior_low[:, 1:] = rolling_extreme(lows, exit_days, np.minimum)[:, :-1]
+
+    signal = np.full(closes.shape, np.nan)
+    with np.errstate(invalid='ignore'):
+        signal[closes < prior_low] = 0.0
+        signal[closes > prior_high] = 1.0
+    positions = forward_fill(signal)
+    positions[np.isnan(positions)] = 0.0
+    return positions
+
+
+def _symbol_strategy_returns(positions, returns, fee):
+    """单股票策略的日收益率: 前一日持仓 × 当日收益 - 换手成本"""
+    held = np.zeros(positions.shape)
+    held[:, 1:] = positions[:, :-1]
+    turnover = np.abs(np.diff(held, axis=1, prepend=0.0))
+    return held * returns - turnover * fee, held, turnover
+
+
+def evaluate_symbol_chunk(strategy, closes, highs, lows, combos, start, fee):
+    """
+    在一组股票上计算所有参数组合的单股票策略（线程池任务）
+    返回每个组合的(按日期求和的策略收益, 按日期的有效股票数, 各股票总收益, 各股票最大回撤, 各股票交易次数)
+    """
+    returns = daily_returns(closes)
+    listed = ~np.isnan(closes)
+    active = listed.copy()
+    active[:, 1:] &= listed[:, :-1]
+    active = active[:, start:]
+
+    results = []
+    for combo in combos:
+        if strategy == 'ma_cross':
+            positions = ma_cross_positions(closes, combo['fast'], combo['slow'])
+        else:
+            positions = breakout_positions(closes, highs, lows, combo['entry'], combo['exit'])
+
+        strategy_returns, held, _ = _symbol_strategy_returns(positions, returns, fee)
+        strategy_returns = strategy_returns[:, start:]
+        equity = np.cumprod(1.0 + strategy_returns, axis=1)
+        if equity.shape[1]:
+            total = equity[:, -1] - 1.0
+            drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1.0).min(axis=1)
+        else:
+            total = drawdown = np.zeros(len(closes))
+        entries = np.zeros(held.shape, dtype=bool)
+        entries[:, 1:] = (held[:, 1:] > 0) & (held[:, :-1] == 0)
+        trades = entries[:, start:].sum(axis=1)
+
+        results.append((np.where(active, strategy_returns, 0.0).sum(axis=0), active.sum(axis=0),
+                        total, drawdown, trades))
+    return results
+
+
+def _run_symbol_strategy(strategy, columns, combos, start, fee):
+    """单股票策略: 按股票分块，股票较多时在线程池中并行"""
+    closes, highs, lows = columns['close'], columns['high'], columns['low']
+    count = len(closes)
+    chunk = BACKTEST_CONFIG['chunk_symbols']
+
+    if count >= BACKTEST_CONFIG['parallel_min_symbols']:
+        pool = _get_pool()
+        futures = [pool.submit(evaluate_symbol_chunk, strategy, closes[i:i + chunk], highs[i:i + chunk],
+                               lows[i:i + chunk], combos, start, fee)
+                   for i in range(0, count, chunk)]
+        chunks = [future.result() for future in futures]
+    else:
+        chunks = [evaluate_symbol_chunk(strategy, closes, highs, lows, combos, start, fee)]
+
+    results = []
+    for index, combo in enumerate(combos):
+        parts = [chunk_results[index] for chunk_results in chunks]
+        summed = np.sum([part[0] for part in parts], axis=0)
+        active = np.sum([part[1] for part in parts], axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            portfolio = np.where(active > 0, summed / active, 0.0)
+        results.append({
+            'params': combo,
+            'returns': portfolio,
+            'symbols': {
+                'total_return': np.concatenate([part[2] for part in parts]),
+                'max_drawdown': np.concatenate([part[3] for part in parts]),
+                'trades': np.concatenate([part[4] for part in parts])
+            }
+        })
+    return results
+
+
+def momentum_weights(closes, lookback, top, rebalance, start):
+    """
+    N日动量轮动的目标权重矩阵[股票, 日期]
+    从start前一日起每rebalance日按lookback日涨幅选出前top只等权持有，直到下一次调仓
+    """
+    count, length = closes.shape
+    momentum = np.full(closes.shape, -np.inf)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        momentum[:, lookback:] = closes[:, lookback:] / closes[:, :-lookback] - 1.0
+    momentum[~np.isfinite(momentum)] = -np.inf
+
+    first = max(start - 1, lookback)
+    rebalance_days = np.arange(first, length, rebalance)
+    weights = np.zeros(closes.shape)
+    if len(rebalance_days) == 0:
+        return weights, rebalance_days, np.zeros((0, count), dtype=bool)
+
+    top = min(top, count)
+    scores = momentum[:, rebalance_days].T  # [调仓日, 股票]
+    picks = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+    selected = np.zeros(scores.shape, dtype=bool)
+    np.put_along_axis(selected, picks, True, axis=1)
+    selected &= np.isfinite(scores)
+    held_count = selected.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        target = np.where(selected, 1.0 / np.maximum(held_count, 1), 0.0)
+
+    # 每个日期使用最近一次调仓的权重
+    latest = np.searchsorted(rebalance_days, np.arange(length), side='right') - 1
+    valid = latest >= 0
+    weights[:, valid] = target[latest[valid]].T
+    return weights, rebalance_days, selected
+
+
+def _run_momentum(columns, combos, start, fee):
+    """动量轮动: 截面排序，各参数组合在当前线程中整体计算"""
+    closes = columns['close']
+    returns = daily_returns(closes)
+
+    results = []
+    for combo in combos:
+        weights, rebalance_days, selected = momentum_weights(closes, combo['lookback'], combo['top'],
+                                                             combo['rebalance'], start)
+        held = np.zeros(weights.shape)
+        held[:, 1:] = weights[:, :-1]
+        turnover = np.abs(np.diff(held, axis=1, prepend=0.0)).sum(axis=0)
+        portfolio = (held * returns).sum(axis=0) - turnover * fee
+        results.append({
+            'params': combo,
+            'returns': portfolio[start:],
+            'rebalances': int(len(rebalance_days)),
+            'holdings': np.flatnonzero(selected[-1]) if len(selected) else np.empty(0, dtype=int)
+        })
+    return results
+
+
+def run_backtest(series_list, strategy, params, days, fee_bps=0.0):
+    """
+    对多只股票的K线序列运行回测/参数扫描
+    series_list需要包含days加上预热期的历史；返回(评估区间日期, 按夏普比率降序的各参数组合结果)
+    """
+    combos = parameter_grid(strategy, params)
+    if not combos:
+        raise ValueError('没有有效的参数组合')
+
+    warmup = warmup_bars(strategy, combos)
+    dates, columns, _ = align_fields(series_list, days + warmup, ('close', 'high', 'low'))
+    start = max(len(dates) - days, 0)
+    fee = fee_bps / 10000.0
+
+    if strategy == 'momentum':
+        results = _run_momentum(columns, combos, start, fee)
+    else:
+        results = _run_symbol_strategy(strategy, columns, combos, start, fee)
+
+    for result in results:
+        result['summary'] = summarize(result['returns'])
+        result['equity'] = np.cumprod(1.0 + result['returns'])
+    results.sort(key=lambda result: result['summary']['sharpe'], reverse=True)
+    return dates[start:], results
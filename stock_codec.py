@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应编码模块
+根据请求的Accept / Accept-Encoding头协商响应格式:
+MessagePack、Arrow IPC 或 JSON(gzip/brotli压缩)，并缓存已编码的响应体
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from flask import Response
+
+# 可选依赖 - 未安装时对应格式自动降级为JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# =============================================================================
+# 配置常量
+# =============================================================================
+MIME_JSON = 'application/json'
+MIME_MSGPACK = 'application/x-msgpack'
+MIME_ARROW = 'application/vnd.apache.arrow.stream'
+
+CODEC_CONFIG = {
+    'min_compress_bytes': 1024,  # 小于该大小的响应不压缩
+    'gzip_level': 6,
+    'brotli_quality': 5,
+    'encoded_cache_entries': 512  # 已编码响应体缓存条目数
+}
+
+# 各格式可接受的MIME类型
+FORMAT_MIME_TYPES = {
+    'msgpack': (MIME_MSGPACK, 'application/msgpack', 'application/vnd.msgpack'),
+    'arrow': (MIME_ARROW, 'application/vnd.apache.arrow.file', 'application/x-arrow'),
+    'json': (MIME_JSON, '*/*', 'application/*')
+}
+
+# K线列的Arrow类型
+ARROW_COLUMN_TYPES = {
+    'date': 'string',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64'
+}
+
+
+def _parse_header_values(header_value):
+    """解析形如 "a;q=0.8, b" 的请求头，返回按q值降序排列的值列表"""
+    if not header_value:
+        return []
+
+    items = []
+    for position, part in enumerate(header_value.split(',')):
+        pieces = part.strip().split(';')
+        value = pieces[0].strip().lower()
+        if not value:
+            continue
+
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+
+        if quality > 0:
+            items.append((-quality, position, value))
+
+    items.sort()
+    return [value for _, _, value in items]
+
+
+def negotiate_format(accept_header):
+    """根据Accept头选择响应格式: msgpack / arrow / json"""
+    for value in _parse_header_values(accept_header):
+        if value in FORMAT_MIME_TYPES['msgpack'] and msgpack is not None:
+            return 'msgpack'
+        if value in FORMAT_MIME_TYPES['arrow'] and pa is not None:
+            return 'arrow'
+        if value in FORMAT_MIME_TYPES['json']:
+            return 'json'
+    return 'json'
+
+
+def negotiate_encoding(accept_encoding):
+    """根据Accept-Encoding头选择压缩方式: br / gzip / None"""
+    accepted = _parse_header_values(accept_encoding)
+    if 'br' in accepted and brotli is not None:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def rows_to_columns(rows, columns):
+    """将字典列表转换为列式字典"""
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+def encode_payload(payload, fmt, columns_key=None):
+    """
+    将响应数据编码为字节
+    columns_key 指定payload中按行存储的列表字段(如chart_data)，
+    二进制格式下该字段会以列式结构输出
+    """
+    if fmt == 'json':
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    rows = payload.get(columns_key) if columns_key else None
+    columns = list(rows[0].keys()) if rows else list(ARROW_COLUMN_TYPES.keys())
+
+    if fmt == 'msgpack':
+        packed = dict(payload)
+        if columns_key:
+            packed[columns_key] = rows_to_columns(rows or [], columns)
+        return msgpack.packb(packed, use_bin_type=True)
+
+    if fmt == 'arrow':
+        # 列数据写入RecordBatch，其他标量字段放入schema元数据
+        column_data = rows_to_columns(rows or [], columns)
+        arrays = [pa.array(column_data[column], type=ARROW_COLUMN_TYPES.get(column))
+                  for column in columns]
+        meta = {key: value for key, value in payload.items() if key != columns_key}
+        schema = pa.schema([(column, array.type) for column, array in zip(columns, arrays)],
+                           metadata={'payload': json.dumps(meta, ensure_ascii=False)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+        return sink.getvalue().to_pybytes()
+
+    raise ValueError(f"不支持的响应格式: {fmt}")
+
+
+def compress_body(body, encoding):
+    """按协商结果压缩响应体"""
+    if encoding is None or len(body) < CODEC_CONFIG['min_compress_bytes']:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=CODEC_CONFIG['brotli_quality']), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=CODEC_CONFIG['gzip_level']), 'gzip'
+    return body, None
+
+
+class EncodedBodyCache:
+    """已编码响应体缓存 - 同一股票同一窗口的重复请求跳过编码和压缩"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or CODEC_CONFIG['encoded_cache_entries']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, fingerprint):
+        """获取缓存的响应体，数据指纹不一致时视为未命中"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, fingerprint, value):
+        """写入响应体，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = (fingerprint, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def discard_where(self, predicate):
+        """移除键满足predicate的所有条目，返回移除的数量"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+
+def build_response(request, payload, columns_key=None, body_cache=None,
+                   cache_key=None, fingerprint=None):
+    """
+    按请求协商结果构建Flask响应
+    payload可以是字典或返回字典的函数(仅在缓存未命中时调用)，
+    提供body_cache/cache_key/fingerprint时复用已编码的响应体
+    """
+    fmt = negotiate_format(request.headers.get('Accept'))
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+
+    cached = None
+    full_key = None
+    if body_cache is not None and cache_key is not None:
+        full_key = (cache_key, fmt, encoding)
+        cached = body_cache.get(full_key, fingerprint)
+
+    if cached is None:
+        if callable(payload):
+            payload = payload()
+        body = encode_payload(payload, fmt, columns_key)
+        body, content_encoding = compress_body(body, encoding)
+        cached = (body, content_encoding)
+        if full_key is not None:
+            body_cache.put(full_key, fingerprint, cached)
+
+    body, content_encoding = cached
+    mimetype = {'json': MIME_JSON, 'msgpack': MIME_MSGPACK, 'arrow': MIME_ARROW}[fmt]
+    response = Response(body, mimetype=mimetype)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    return response
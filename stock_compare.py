@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多股票对比模块
+按交易日对齐多只股票的K线列数组，停牌日沿用前一交易日收盘价，
+计算以100为基准的归一化收盘价和日收益率相关系数矩阵
+"""
+
+import numpy as np
+from kline_store import PRICE_SCALE
+
+
+def align_fields(series_list, days, fields=('close',)):
+    """
+    将多只股票的指定价格列对齐到最近days个交易日（各股票交易日的并集）
+    返回(日期数组, {列名: 矩阵[股票, 日期]}, 停牌标记矩阵)；
+    上市前的日期为NaN，停牌日沿用前一交易日的值
+    """
+    all_dates = [series.bars['trade_date'] for series in series_list if len(series)]
+    if not all_dates:
+        empty = np.empty((len(series_list), 0))
+        return (np.empty(0, dtype=np.int32), {field: empty for field in fields},
+                np.empty((len(series_list), 0), dtype=bool))
+
+    dates = np.unique(np.concatenate(all_dates))[-days:]
+    columns = {field: np.full((len(series_list), len(dates)), np.nan) for field in fields}
+    suspended = np.zeros((len(series_list), len(dates)), dtype=bool)
+
+    for row, series in enumerate(series_list):
+        if len(series) == 0:
+            continue
+        symbol_dates = series.bars['trade_date']
+        # 每个日期对应该股票当日或之前最近一根K线，即前向填充
+        index = np.searchsorted(symbol_dates, dates, side='right') - 1
+        listed = index >= 0
+        safe_index = np.maximum(index, 0)
+        for field, matrix in columns.items():
+            matrix[row] = np.where(listed, series.bars[field][safe_index] / PRICE_SCALE, np.nan)
+        suspended[row] = listed & (symbol_dates[safe_index] != dates)
+
+    return dates, columns, suspended
+
+
+def align_closes(series_list, days):
+    """
+    将多只股票的收盘价对齐到最近days个交易日
+    返回(日期数组, 收盘价矩阵[股票, 日期], 停牌标记矩阵)
+    """
+    dates, columns, suspended = align_fields(series_list, days)
+    return dates, columns['close'], suspended
+
+
+def rebase(closes, base=100.0):
+    """以每只股票窗口内第一个有效收盘价为基准归一化"""
+    valid = ~np.isnan(closes)
+    first = np.argmax(valid, axis=1)
+    base_values = closes[np.arange(len(closes)), first]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return closes / base_values[:, None] * base
+
+
+def return_correlation(closes):
+    """
+    计算日收益率的相关系数矩阵
+    只使用所有股票都有数据的日期；停牌日前向填充后收益率为0
+    """
+    if closes.shape[1] < 3:
+        return np.full((len(closes), len(closes)), np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = closes[:, 1:] / closes[:, :-1] - 1.0
+    common = ~np.isnan(returns).any(axis=0)
+    returns = returns[:, common]
+    if returns.shape[1] < 2:
+        return np.full((len(closes), len(closes)), np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.atleast_2d(np.corrcoef(returns))
+
+
+def compare_series(series_list, days):
+    """对齐并计算多只股票的对比数据"""
+    dates, closes, suspended = align_closes(series_list, days)
+    return {
+        'dates': dates,
+        'closes': closes,
+        'rebased': rebase(closes) if closes.size else closes,
+        'suspended': suspended,
+        'correlation': return_correlation(closes)
+    }
@@ -8,10 +8,19 @@
 import pandas as pd
 import pickle
 import os
+import threading
 import time
-import easyquotation
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from functools import lru_cache
+from alert_engine import AlertEngine
+from background_refresh import BackgroundRefresher
+from data_providers import create_provider_pool
+from kline_cache import KlineCache
+from kline_store import KlineEntry, KlineSeries, KlineStore
+from snapshot_archive import SnapshotArchiveReader, SnapshotArchiveWriter
+from stock_codec import EncodedBodyCache
+from trading_calendar import TradingCalendar
 
 # =============================================================================
 # 配置常量
@@ -19,6 +28,9 @@ from functools import lru_cache
 # 缓存配置
 CACHE_DIR = 'cache'
 STOCK_LIST_CACHE_FILE = os.path.join(CACHE_DIR, 'stock_list.pkl')
+KLINE_STORE_DIR = os.path.join(CACHE_DIR, 'kline')  # K线列式存储目录
+SNAPSHOT_ARCHIVE_DIR = os.path.join(CACHE_DIR, 'snapshots')  # 盘中快照归档目录
+ALERT_RULES_FILE = os.path.join(CACHE_DIR, 'alert_rules.npz')  # 行情提醒规则文件
 CACHE_EXPIRY_HOURS = 24  # 缓存过期时间（小时）
 
 # 交易时间配置
@@ -29,12 +41,47 @@ TRADING_TIME_CONFIG = {
     'afternoon_end': '15:00',
     'market_close': '15:00'
 }
+TRADING_HOLIDAYS_FILE = 'trading_holidays.txt'  # 交易所休市日文件
 
 # API配置
 API_CONFIG = {
     'default_days': 60,  # 默认K线数据天数
     'search_limit': 10,  # 搜索结果限制
-    'extra_days': 30     # 额外获取天数以应对节假日
+    'extra_days': 30,    # 额外获取天数以应对节假日
+    'compare_limit': 50  # 对比接口最多支持的股票数量
+}
+
+# 过期数据(stale-while-revalidate)配置: 过期不超过该时长的数据先返回，同时在后台刷新
+STALE_CONFIG = {
+    'kline_stale_seconds': 12 * 3600,  # K线序列
+    'quote_ttl_seconds': 10,           # 交易时段内行情结果的有效期
+    'quote_stale_seconds': 300,        # 行情结果
+    'refresh_workers': 4,              # 后台刷新线程数
+    'warm_workers': 2                  # 缓存预热线程数（独立线程池，不占用后台刷新线程）
+}
+
+# 快照归档配置
+SNAPSHOT_ARCHIVE_CONFIG = {
+    'enabled': True,         # 是否归档每次获取的市场快照
+    'delta': True,           # 是否对相邻帧做增量编码
+    'keyframe_interval': 60  # 每隔多少个增量帧写入一个完整帧
+}
+
+# 数据源配置: 按顺序作为初始优先级，之后按各数据源的健康评分动态排序
+DATA_PROVIDER_CONFIG = {
+    'providers': os.environ.get('DATA_PROVIDERS', 'sina,tencent').split(','),  # 可追加local作为离线兜底
+    'hedge': True  # 主数据源超过其p95延迟未返回时，向备用数据源发起对冲请求
+}
+
+# K线缓存配置
+KLINE_CACHE_CONFIG = {
+    'max_mb': float(os.environ.get('KLINE_CACHE_MAX_MB', 256)),  # K线内存缓存的字节预算（MB）
+    'refresh_seconds': 60,   # 交易时间内K线序列的刷新间隔（秒）
+    'snapshot_refresh_seconds': 10,  # 交易时间内市场快照的刷新间隔（秒）
+    'refresh_datalen': 5,    # 增量刷新时向上游请求的K线条数
+    'page_size': 1000,       # 分页回补时每页增加的K线条数
+    'max_datalen': 10000,    # 单只股票回补的K线条数上限（约40年）
+    'fetch_workers': 8       # 批量获取多只股票K线时的并发数
 }
 
 
@@ -51,114 +98,215 @@ def init_cache_directory():
 init_cache_directory()
 
 # =============================================================================
-# LRU缓存函数 - 日K数据
+# 日K数据获取与缓存
 # =============================================================================
-@lru_cache(maxsize=200)  # 缓存200只股票的数据
 def _fetch_daily_kline_data(ts_code, days=60):
-    """获取股票日K线数据的核心函数 - 带LRU缓存"""
-    import requests
-    import json
+    """
+    从数据源池获取股票最近days条日K线数据的核心函数（按健康状况自动切换数据源）
+    返回(K线记录列表, 是否为本地兜底的过期数据)
+    """
+    print(f"获取 {ts_code} 最近 {days} 条历史K线数据...")
+    try:
+        return provider_pool.fetch_kline(ts_code, days)
+    except Exception as e:
+        print(f"获取 {ts_code} 的K线数据时出错: {e}")
+        return None, False
+
+# 行情数据源池（新浪、腾讯，可选本地文件兜底），替代直接依赖easyquotation
+provider_pool = create_provider_pool(DATA_PROVIDER_CONFIG['providers'], KLINE_STORE_DIR,
+                                     SNAPSHOT_ARCHIVE_DIR, hedge=DATA_PROVIDER_CONFIG['hedge'])
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'currsize',
+                                     'bytes_used', 'max_bytes'])
+
+# K线列式磁盘存储
+kline_store = KlineStore(KLINE_STORE_DIR)
+
+# 后台刷新线程池（按键去重）
+_refresher = BackgroundRefresher(STALE_CONFIG['refresh_workers'], bulk_workers=STALE_CONFIG['warm_workers'])
+
+# 按股票记录的K线缓存失效次数: 刷新开始后缓存被失效时，刷新结果不再写入缓存和磁盘
+_kline_generations = {}
+# 已失效、需要从实时数据源完整回补的股票（不再使用磁盘上可能有错误的K线）
+_kline_force_backfill = set()
+_kline_invalidate_lock = threading.Lock()
+
+# 交易日历（交易时段 + 休市日）
+trading_calendar = TradingCalendar.from_config(TRADING_TIME_CONFIG, TRADING_HOLIDAYS_FILE)
+
+# 按股票缓存的K线序列: ts_code -> KlineEntry，按字节预算淘汰
+_kline_cache = KlineCache(KLINE_CACHE_CONFIG['max_mb'] * 1024 * 1024)
+
+
+def _kline_entry_expired(entry, now):
+    """
+    判断缓存的K线序列是否需要刷新
+    获取之后出现过收盘的需要刷新一次拿到最终K线；交易时段内按刷新间隔更新最后一根K线；
+    其余时间（盘后、周末、节假日）缓存一直有效；来自本地兜底的过期数据总是需要刷新
+    """
+    if entry.stale:
+        return True
     
-    print(f"[缓存未命中] 从新浪财经获取 {ts_code} 的真实历史K线数据...")
+    if entry.fetched_at < trading_calendar.last_close(now):
+        return True
     
-    # 将ts_code转换为新浪财经使用的格式
-    market_code = ts_code.split('.')
-    if len(market_code) != 2:
-        print(f"无效的股票代码格式: {ts_code}")
-        return None
-        
-    code = market_code[0]
-    market = market_code[1].lower()
-    sina_code = f"{market}{code}"  # 例如: sz000001, sh600519
+    if trading_calendar.is_open(now):
+        return (now - entry.fetched_at).total_seconds() >= KLINE_CACHE_CONFIG['refresh_seconds']
     
-    try:
-        # 新浪财经历史K线API
-        url = "https://money.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData"
-        params = {
-            'symbol': sina_code,
-            'scale': '240',  # 日线
-            'ma': 'no',
-            'datalen': str(days)  # 获取指定天数
-        }
-        
-        print(f"请求新浪财经API: {sina_code}")
-        response = requests.get(url, params=params, timeout=10)
+    return False
+
+
+def _kline_entry_covers(entry, days=None, start_date=None):
+    """判断缓存的K线序列是否覆盖请求的窗口"""
+    if entry.complete:
+        return True
+    if days is not None and entry.datalen < days:
+        return False
+    if start_date is not None:
+        first_date = entry.series.first_date
+        if first_date is None or first_date > int(start_date):
+            return False
+    return True
+
+
+def _estimate_bars_since(start_date, now):
+    """估算从start_date至今的交易日数量（每年约245个交易日，另加节假日余量）"""
+    calendar_days = (now - datetime.strptime(str(start_date), '%Y%m%d')).days
+    return max(int(calendar_days * 245 / 365), 0) + API_CONFIG['extra_days']
+
+
+def _backfill_kline_series(ts_code, days=None, start_date=None, now=None):
+    """
+    分页回补K线历史
+    新浪接口只能返回最近datalen条K线，因此逐页扩大datalen，直到覆盖所需条数/起始日期、
+    上游已无更早的数据或达到回补上限。返回(序列, 已请求条数, 是否已到最早数据, 是否为过期数据)
+    本地兜底返回的过期数据不能说明上游已无更早的数据，不标记为已到最早数据
+    """
+    now = now or datetime.now()
+    target = days if days is not None else _estimate_bars_since(start_date, now)
+    datalen = min(max(target, 1), KLINE_CACHE_CONFIG['max_datalen'])
+    series = None
+    
+    stale = False
+    
+    while True:
+        records, page_stale = _fetch_daily_kline_data(ts_code, datalen)
+        if records is None:
+            return series, datalen, False, stale
         
-        if response.status_code != 200:
-            print(f"新浪财经API请求失败，状态码: {response.status_code}")
-            return None
+        page = KlineSeries.from_records(ts_code, records)
+        series = page if series is None else series.merge(page)
+        stale = stale or page_stale
+        if stale:
+            # 本地兜底无法提供更早的数据，等实时数据源恢复后再回补
+            return series, datalen, False, stale
         
-        content = response.text
-        if not content.strip():
-            print("新浪财经API返回空数据")
-            return None
+        complete = len(records) < datalen
+        covered = ((days is None or len(series) >= days) and
+                   (start_date is None or series.first_date <= int(start_date)))
+        if covered or complete or datalen >= KLINE_CACHE_CONFIG['max_datalen']:
+            return series, datalen, complete, stale
         
-        # 解析JSON数据
-        try:
-            kline_data = json.loads(content)
-            if not kline_data:
-                print("新浪财经API返回空的K线数据")
-                return None
-            
-            print(f"从新浪财经获取到 {len(kline_data)} 条真实K线数据")
-            
-            # 转换为标准格式
-            daily_data_list = []
-            for record in kline_data:
-                try:
-                    # 新浪财经返回格式: {"day":"2025-07-08","open":"12.750","high":"12.840","low":"12.650","close":"12.690","volume":"109098597"}
-                    trade_date = record['day'].replace('-', '')  # 转换为YYYYMMDD格式
-                    
-                    daily_data_list.append({
-                        'ts_code': ts_code,
-                        'trade_date': trade_date,
-                        'open': float(record['open']),
-                        'high': float(record['high']),
-                        'low': float(record['low']),
-                        'close': float(record['close']),
-                        'pre_close': 0.0,  # 新浪数据中没有昨收价，后续计算
-                        'vol': int(float(record['volume'])),
-                        'amount': 0  # 新浪数据中没有成交额
-                    })
-                except (KeyError, ValueError) as e:
-                    print(f"解析K线记录失败: {e}, 记录: {record}")
-                    continue
-            
-            if not daily_data_list:
-                print("没有有效的K线数据")
-                return None
-            
-            # 计算昨收价 (pre_close)
-            for i in range(len(daily_data_list)):
-                if i > 0:
-                    daily_data_list[i]['pre_close'] = daily_data_list[i-1]['close']
-                else:
-                    # 第一条记录的昨收价设为开盘价
-                    daily_data_list[i]['pre_close'] = daily_data_list[i]['open']
-            
-            # 按日期排序 (确保时间顺序正确)
-            daily_data_list.sort(key=lambda x: x['trade_date'])
-            
-            # 返回字典列表，避免DataFrame的序列化问题
-            return daily_data_list
-            
-        except json.JSONDecodeError as e:
-            print(f"新浪财经API返回数据解析失败: {e}")
-            print(f"返回内容片段: {content[:200]}...")
-            return None
-            
-    except Exception as e:
-        print(f"获取 {ts_code} 的新浪财经数据时出错: {e}")
+        datalen = min(datalen + KLINE_CACHE_CONFIG['page_size'], KLINE_CACHE_CONFIG['max_datalen'])
+        print(f"[K线回补] {ts_code} 尚未覆盖到 {start_date or f'{days}条'}，继续请求 {datalen} 条")
+
+
+def _load_kline_entry(ts_code):
+    """从内存缓存或磁盘存储中获取K线缓存条目"""
+    entry = _kline_cache.get(ts_code)
+    if entry is not None:
+        return entry
+    
+    if ts_code in _kline_force_backfill:
+        return None
+    
+    series, mtime = kline_store.load(ts_code)
+    if series is None:
         return None
+    
+    entry = KlineEntry(series, len(series), False, datetime.fromtimestamp(mtime))
+    _kline_cache.put(ts_code, entry, entry.nbytes)
+    return entry
+
+
+def _refresh_kline_series(ts_code, days=None, start_date=None):
+    """
+    同步刷新覆盖请求窗口（最近days条，或start_date至今）的K线序列，返回K线缓存条目
+    已缓存的序列过期后只请求少量最近K线并合并；窗口不足时分页回补更早的历史
+    """
+    now = datetime.now()
+    generation = _kline_generations.get(ts_code, 0)
+    entry = _load_kline_entry(ts_code)
+    
+    # 并发请求或后台任务可能已经刷新过
+    if entry is not None and _kline_entry_covers(entry, days, start_date) and not _kline_entry_expired(entry, now):
+        return entry
+    
+    series = None
+    stale = False
+    
+    if entry is not None and _kline_entry_covers(entry, days, start_date):
+        # 增量刷新: 只获取最近几条K线
+        print(f"[缓存刷新] 增量获取 {ts_code} 最近 {KLINE_CACHE_CONFIG['refresh_datalen']} 条K线")
+        records, records_stale = _fetch_daily_kline_data(ts_code, KLINE_CACHE_CONFIG['refresh_datalen'])
+        if records is None or records_stale:
+            # 实时数据源失败时继续使用已缓存的数据
+            return entry
+        
+        recent = KlineSeries.from_records(ts_code, records)
+        cached = entry.series
+        # 增量数据与缓存之间可能存在缺口时，需要重新回补整个窗口
+        if len(cached) == 0 or len(recent) == 0 or recent.first_date <= cached.last_date:
+            series = cached.merge(recent)
+            datalen, complete = entry.datalen, entry.complete
+    
+    if series is None:
+        print(f"[缓存未命中] 回补 {ts_code} 的K线历史")
+        series, datalen, complete, stale = _backfill_kline_series(ts_code, days, start_date, now)
+        if series is None:
+            return entry
+        if entry is not None:
+            series = entry.series.merge(series)
+            datalen = max(datalen, entry.datalen)
+            stale = stale or entry.stale
+    
+    entry = KlineEntry(series, datalen, complete, now, stale)
+    with _kline_invalidate_lock:
+        if _kline_generations.get(ts_code, 0) != generation:
+            # 刷新期间缓存被失效，丢弃本次结果，避免把失效前的K线写回缓存和磁盘
+            print(f"[缓存刷新] {ts_code} 的K线在刷新期间已失效，本次结果不写入缓存")
+            return entry
+        _kline_cache.put(ts_code, entry, entry.nbytes)
+        if not stale:
+            # 过期数据本身就来自本地存储，无需写回
+            kline_store.save(series)
+            _kline_force_backfill.discard(ts_code)
+    return entry
 
-# 创建easyquotation实例，用于获取实时行情
-try:
-    quotation = easyquotation.use('sina')
-    print("easyquotation初始化成功")
-except Exception as e:
-    print(f"easyquotation初始化失败: {e}")
-    quotation = None
 
+def _get_kline_series(ts_code, days=None, start_date=None, allow_stale=False):
+    """
+    获取覆盖请求窗口的K线序列，返回(序列, 是否为过期数据)
+    allow_stale为True时，过期不久（在stale窗口内）的序列立即返回并在后台刷新
+    """
+    now = datetime.now()
+    entry = _load_kline_entry(ts_code)
+    
+    if entry is not None and _kline_entry_covers(entry, days, start_date):
+        if not _kline_entry_expired(entry, now):
+            return entry.series, False
+        
+        age = (now - entry.fetched_at).total_seconds()
+        if allow_stale and age <= STALE_CONFIG['kline_stale_seconds']:
+            if _refresher.submit(('kline', ts_code), _refresh_kline_series, ts_code, days, start_date):
+                print(f"[后台刷新] {ts_code} 的K线已过期 {age:.0f} 秒，先返回缓存数据")
+            return entry.series, True
+    
+    # 同步刷新与后台刷新共用按股票去重的进行中任务表，并发未命中只请求一次上游
+    entry = _refresher.run(('kline', ts_code), _refresh_kline_series, ts_code, days, start_date)
+    if entry is None:
+        return None, False
+    return entry.series, entry.stale
 
 class StockDataCache:
     """股票数据缓存管理类"""
@@ -168,6 +316,21 @@ class StockDataCache:
         self.stock_dict = {}  # 股票代码映射字典
         self.daily_quotes = None  # 每日行情数据缓存
         self.last_quote_update = None  # 最后更新行情的时间
+        self.quotes_stale = False  # 当前快照是否来自本地兜底的过期数据
+        self.stock_list_version = 0  # 股票列表版本号，每次加载/更新后递增
+        self.encoded_bodies = EncodedBodyCache()  # 已编码响应体缓存
+        self.calendar = trading_calendar  # 交易日历
+        self.quote_cache = {}  # 行情结果缓存: ts_code -> (结果, 计算时间)
+        self.replay_mode = False  # 回放模式下行情只来自归档，不请求上游
+        self.snapshot_archive = None  # 盘中快照归档写入器
+        self.alerts = AlertEngine(ALERT_RULES_FILE)  # 行情提醒规则
+        self._alert_poller = None  # 有启用的提醒规则时在后台轮询市场快照的线程
+        self._alert_poller_lock = threading.Lock()
+        if SNAPSHOT_ARCHIVE_CONFIG['enabled']:
+            self.snapshot_archive = SnapshotArchiveWriter(
+                SNAPSHOT_ARCHIVE_DIR,
+                delta=SNAPSHOT_ARCHIVE_CONFIG['delta'],
+                keyframe_interval=SNAPSHOT_ARCHIVE_CONFIG['keyframe_interval'])
         self.load_stock_list_cache()
     
     def is_cache_valid(self, file_path):
@@ -188,6 +351,7 @@ class StockDataCache:
                     cache_data = pickle.load(f)
                     self.stock_list = cache_data['stock_list']
                     self.stock_dict = cache_data['stock_dict']
+                    self.stock_list_version += 1
                     print("股票列表缓存加载成功")
                     return True
             except Exception as e:
@@ -208,24 +372,29 @@ class StockDataCache:
             print(f"缓存保存失败: {e}")
     
     def update_stock_list(self):
-        """更新股票列表 - 从easyquotation获取全量股票数据"""
+        """更新股票列表 - 从数据源池获取全量股票数据"""
         try:
-            print("正在从easyquotation获取全量股票列表...")
+            print("正在从数据源获取全量股票列表...")
             print("这可能需要几分钟时间，请耐心等待...")
             
-            if not quotation:
-                raise RuntimeError("easyquotation未初始化，无法获取股票数据")
+            if not provider_pool.providers:
+                raise RuntimeError("没有可用的数据源，无法获取股票数据")
             
             # 获取全量股票数据
             all_stocks = []
             
+            # 数据源未提供名称时（本地兜底）沿用已有股票列表中的名称
+            known_names = {}
+            if self.stock_list is not None and not self.stock_list.empty:
+                known_names = dict(zip(self.stock_list['symbol'], self.stock_list['name']))
+            
             try:
-                # 从easyquotation获取市场快照，这里包含了大量的股票
+                # 从数据源获取股票全集（市场快照），这里包含了大量的股票
                 print("正在获取市场快照数据...")
-                market_data = quotation.market_snapshot(prefix=True)
+                market_data, stale = provider_pool.stock_universe()
                 
                 if market_data:
-                    print(f"获取到 {len(market_data)} 个股票的市场数据")
+                    print(f"获取到 {len(market_data)} 个股票的市场数据" + ("（本地过期数据）" if stale else ""))
                     
                     # 处理所有股票数据
                     processed_count = 0
@@ -234,7 +403,7 @@ class StockDataCache:
                             if code.startswith(('sh6', 'sz0', 'sz3', 'sz2')):  # A股代码格式
                                 symbol = code[2:]  # 去除sh/sz前缀
                                 ts_code = f"{symbol}.{'SH' if code.startswith('sh') else 'SZ'}"
-                                name = data.get('name', f'股票{symbol}')
+                                name = data.get('name') or known_names.get(symbol) or f'股票{symbol}'
                                 
                                 # 判断市场
                                 if code.startswith('sh'):
@@ -283,12 +452,12 @@ class StockDataCache:
                             # 忽略单个股票处理错误
                             continue
                     
-                    print(f"从easyquotation成功获取 {processed_count} 只新股票")
+                    print(f"从数据源成功获取 {processed_count} 只新股票")
                 else:
                     raise RuntimeError("未获取到市场数据")
             
             except Exception as e:
-                print(f"从easyquotation获取数据失败: {e}")
+                print(f"从数据源获取数据失败: {e}")
                 raise
             
             # 创建DataFrame
@@ -310,6 +479,8 @@ class StockDataCache:
                 # 名称 -> 标准代码映射
                 self.stock_dict[row['name']] = row['ts_code']
             
+            self.stock_list_version += 1
+            
             # 保存到缓存
             self.save_stock_list_cache()
             print(f"股票列表更新成功！共获取 {len(self.stock_list)} 只股票")
@@ -340,6 +511,13 @@ class StockDataCache:
         
         return None
     
+    def get_board_ts_codes(self, board):
+        """获取某个板块（如主板、创业板、科创板）或市场（沪A、深A）的全部股票代码"""
+        if self.stock_list is None:
+            return []
+        mask = (self.stock_list['industry'] == board) | (self.stock_list['market'] == board)
+        return self.stock_list.loc[mask, 'ts_code'].tolist()
+    
     def get_all_stock_mappings(self):
         """获取所有股票的映射关系，用于前端精确识别"""
         if self.stock_list is None:
@@ -374,47 +552,69 @@ class StockDataCache:
         return mappings
     
     def is_trading_time(self, current_time=None):
-        """判断是否在交易时间内"""
+        """
+        判断是否在交易时间内（考虑周末和交易所休市日）
+        current_time可以是datetime，或当天的time对象
+        """
         if current_time is None:
-            current_time = datetime.now().time()
+            current_time = datetime.now()
+        elif not isinstance(current_time, datetime):
+            current_time = datetime.combine(datetime.now().date(), current_time)
+        
+        return self.calendar.is_open(current_time)
+    
+    def is_quote_snapshot_fresh(self, now=None):
+        """判断缓存的市场快照是否仍然有效"""
+        if self.daily_quotes is None or self.last_quote_update is None:
+            return False
         
-        morning_start = datetime.strptime(TRADING_TIME_CONFIG['morning_start'], '%H:%M').time()
-        morning_end = datetime.strptime(TRADING_TIME_CONFIG['morning_end'], '%H:%M').time()
-        afternoon_start = datetime.strptime(TRADING_TIME_CONFIG['afternoon_start'], '%H:%M').time()
-        afternoon_end = datetime.strptime(TRADING_TIME_CONFIG['afternoon_end'], '%H:%M').time()
+        now = now or datetime.now()
+        if self.calendar.is_open(now) or self.quotes_stale:
+            # 交易时段内按刷新间隔更新；本地兜底的过期快照也按刷新间隔重试实时数据源
+            age = (now - self.last_quote_update).total_seconds()
+            return age < KLINE_CACHE_CONFIG['snapshot_refresh_seconds']
         
-        return ((current_time >= morning_start and current_time <= morning_end) or
-                (current_time >= afternoon_start and current_time <= afternoon_end))
+        # 休市期间，最近一次收盘后获取的快照一直有效
+        return self.last_quote_update >= self.calendar.last_close(now)
     
     def update_daily_quotes(self):
-        """更新每日行情数据 - 使用easyquotation实时数据"""
+        """
+        更新每日行情数据 - 使用数据源池的实时快照
+        快照过期后，请求线程、后台行情刷新和提醒轮询共用同一个进行中的刷新任务，每次只请求一次全市场快照
+        """
+        if self.replay_mode or self.is_quote_snapshot_fresh():
+            print("使用缓存的行情数据")
+            return True
+        return _refresher.run(('quote_snapshot',), self._refresh_daily_quotes)
+    
+    def _refresh_daily_quotes(self):
+        """获取全市场快照并替换当前快照（只应通过update_daily_quotes的去重任务调用）"""
         try:
             # 获取当前日期和时间
             current_date = datetime.now()
             
-            # 如果已经有缓存且是今天的数据，直接返回
-            if (self.daily_quotes is not None and 
-                self.last_quote_update is not None and 
-                self.last_quote_update.date() == current_date.date()):
+            # 快照仍然有效（交易时段内未到刷新间隔，或休市期间已有收盘后的快照）时直接返回，
+            # 例如等待去重任务期间其他调用方刚完成了刷新
+            if self.replay_mode or self.is_quote_snapshot_fresh(current_date):
                 print("使用缓存的行情数据")
                 return True
             
-            print("正在从easyquotation获取实时行情数据...")
+            print("正在从数据源获取实时行情数据...")
             
-            if not quotation:
-                print("easyquotation未初始化，无法获取行情数据")
+            if not provider_pool.providers:
+                print("没有可用的数据源，无法获取行情数据")
                 return False
             
             try:
                 # 获取实时市场快照
-                market_data = quotation.market_snapshot(prefix=True)
+                market_data, stale = provider_pool.market_snapshot()
                 
                 if not market_data:
                     print("未获取到市场数据")
                     return False
                 
-                # 构建行情数据字典
-                self.daily_quotes = {}
+                # 构建行情数据字典（构建完成后整体替换，避免并发读取到不完整的快照）
+                daily_quotes = {}
                 
                 for code, data in market_data.items():
                     try:
@@ -429,7 +629,7 @@ class StockDataCache:
                             change = round(current_price - pre_close, 2)
                             pct_chg = round((change / pre_close * 100), 2) if pre_close > 0 else 0
                             
-                            self.daily_quotes[ts_code] = {
+                            daily_quotes[ts_code] = {
                                 'trade_date': current_date.strftime('%Y%m%d'),
                                 'close': current_price,
                                 'pre_close': pre_close,
@@ -445,9 +645,21 @@ class StockDataCache:
                         print(f"处理股票 {code} 数据时出错: {e}")
                         continue
                 
+                self.daily_quotes = daily_quotes
                 self.last_quote_update = current_date
+                self.quotes_stale = stale
+                if stale:
+                    # 过期快照不归档，也不用于判断提醒规则
+                    print(f"实时数据源不可用，使用本地过期快照（{len(self.daily_quotes)} 只股票）")
+                    return True
                 print(f"成功获取 {len(self.daily_quotes)} 只股票的实时行情数据")
                 
+                # 追加到当日快照归档
+                self.archive_quote_snapshot(current_date)
+                
+                # 判断行情提醒规则
+                self.evaluate_alerts(current_date)
+                
                 # 显示一些样本数据
                 if self.daily_quotes:
                     sample_stock = next(iter(self.daily_quotes))
@@ -456,7 +668,7 @@ class StockDataCache:
                 return True
                 
             except Exception as e:
-                print(f"从easyquotation获取数据失败: {e}")
+                print(f"从数据源获取数据失败: {e}")
                 return False
                 
         except Exception as e:
@@ -465,42 +677,151 @@ class StockDataCache:
             print("错误详情:", traceback.format_exc())
             return False
     
+    def archive_quote_snapshot(self, timestamp):
+        """将当前市场快照追加到当日归档"""
+        if self.snapshot_archive is None or not self.daily_quotes:
+            return
+        try:
+            written = self.snapshot_archive.append(timestamp, self.daily_quotes)
+            print(f"快照已归档: {written} 字节")
+        except Exception as e:
+            print(f"快照归档失败: {e}")
+    
+    def apply_quote_snapshot(self, quotes, timestamp, notify=True):
+        """
+        使用外部提供的快照（归档恢复或回放）替换当前市场快照
+        notify为False时只更新提醒规则状态而不分发提醒（避免重启后重复提醒）
+        """
+        self.daily_quotes = quotes
+        self.last_quote_update = timestamp
+        self.quotes_stale = False
+        self.evaluate_alerts(timestamp, notify)
+    
+    def evaluate_alerts(self, timestamp, notify=True):
+        """对当前快照判断提醒规则；交易日变化或有新增N日类规则时在后台计算参考值"""
+        try:
+            trade_date = timestamp.strftime('%Y%m%d')
+            self.refresh_alert_references(trade_date)
+            self.alerts.evaluate(self.daily_quotes, timestamp, notify)
+        except Exception as e:
+            print(f"判断行情提醒失败: {e}")
+    
+    def refresh_alert_references(self, trade_date):
+        """在后台计算N日类提醒规则的参考值（前N日均量、最高价、最低价）"""
+        ts_codes = self.alerts.pending_reference_codes(trade_date)
+        if ts_codes:
+            _refresher.submit(('alert_reference', trade_date), self.alerts.refresh_references,
+                              self.get_kline_series, trade_date, ts_codes)
+    
+    def ensure_alert_poller(self):
+        """有启用的提醒规则时启动后台快照轮询线程，没有启用的规则后线程自动退出"""
+        with self._alert_poller_lock:
+            if self._alert_poller is None and self.alerts.has_active_rules():
+                self._alert_poller = threading.Thread(target=self._poll_alert_snapshots,
+                                                      name='alert-poller', daemon=True)
+                self._alert_poller.start()
+                print("行情提醒快照轮询已启动")
+    
+    def _poll_alert_snapshots(self):
+        """
+        交易时段内按快照刷新间隔在后台更新市场快照，提醒规则随快照更新得到判断，
+        不再依赖有人请求行情；回放模式下快照由回放线程驱动
+        """
+        while True:
+            with self._alert_poller_lock:
+                if not self.alerts.has_active_rules():
+                    self._alert_poller = None
+                    print("没有启用的提醒规则，快照轮询已停止")
+                    return
+            
+            if not self.replay_mode and self.calendar.is_open(datetime.now()):
+                _refresher.submit(('quote_snapshot',), self._refresh_daily_quotes)
+            time.sleep(KLINE_CACHE_CONFIG['snapshot_refresh_seconds'])
+    
+    def restore_quote_snapshot(self):
+        """启动时从快照归档恢复当日（或最近一个交易日）最后一帧快照"""
+        now = datetime.now()
+        days = [now.strftime('%Y%m%d'), self.calendar.last_close(now).strftime('%Y%m%d')]
+        
+        for day in dict.fromkeys(days):
+            try:
+                reader = SnapshotArchiveReader(SNAPSHOT_ARCHIVE_DIR, day)
+                timestamp, records = reader.latest()
+                if records is None:
+                    continue
+                self.apply_quote_snapshot(reader.to_quotes(records), timestamp, notify=False)
+                print(f"从快照归档恢复 {day} 的行情: {len(self.daily_quotes)} 只股票，快照时间 {timestamp}")
+                return True
+            except Exception as e:
+                print(f"从快照归档恢复 {day} 的行情失败: {e}")
+        return False
+    
+    def is_quote_fresh(self, computed_at, now):
+        """判断缓存的行情结果是否仍然有效"""
+        if self.replay_mode:
+            # 回放模式下快照随时更新，与交易时段无关
+            return (now - computed_at).total_seconds() < STALE_CONFIG['quote_ttl_seconds']
+        if computed_at < self.calendar.last_close(now):
+            return False
+        if self.calendar.is_open(now):
+            return (now - computed_at).total_seconds() < STALE_CONFIG['quote_ttl_seconds']
+        return True
+    
     def get_stock_quote(self, ts_code):
-        """获取股票行情数据，包含多期间涨跌幅"""
+        """
+        获取股票行情数据，包含多期间涨跌幅
+        缓存的结果过期不久时立即返回（stale为True），同时在后台重新计算
+        """
+        now = datetime.now()
+        cached = self.quote_cache.get(ts_code)
+        if cached is not None:
+            quote, computed_at = cached
+            if self.is_quote_fresh(computed_at, now):
+                return quote
+            
+            age = (now - computed_at).total_seconds()
+            if age <= STALE_CONFIG['quote_stale_seconds']:
+                if _refresher.submit(('quote', ts_code), self._refresh_stock_quote, ts_code):
+                    print(f"[后台刷新] {ts_code} 的行情已过期 {age:.0f} 秒，先返回缓存数据")
+                return dict(quote, stale=True)
+        
+        return self._refresh_stock_quote(ts_code)
+    
+    def _refresh_stock_quote(self, ts_code):
+        """重新计算股票行情并写入缓存"""
+        quote = self._build_stock_quote(ts_code)
+        if quote is not None:
+            self.quote_cache[ts_code] = (quote, datetime.now())
+        return quote
+    
+    def _build_stock_quote(self, ts_code):
+        """计算股票行情数据，包含多期间涨跌幅"""
         try:
-            # 获取当前时间，判断是否在交易时间内
+            # 获取当前时间，根据交易日历判断是否在交易时间内（周末和节假日不请求实时行情）
             current_date = datetime.now()
-            current_time = current_date.time()
-            is_trading_time = self.is_trading_time(current_time)
+            is_trading_time = self.is_trading_time(current_date)
             
             # 首先获取历史K线数据来计算多期间涨跌幅
-            historical_data = self.get_daily_data(ts_code, days=15)  # 获取15天数据确保有足够的交易日
+            historical_data = self.get_daily_data(ts_code, days=15, allow_stale=False)  # 获取15天数据确保有足够的交易日
             
             current_price = None
             pre_close = None
+            stale = bool(historical_data is not None and historical_data.attrs.get('stale'))
             
-            # 如果是交易时间，尝试获取实时数据
-            if is_trading_time:
+            # 如果是交易时间，从共享的市场快照中获取实时数据（快照按刷新间隔更新，不再每次请求全市场）
+            # 回放模式下快照来自归档，不受交易时段限制
+            if is_trading_time or self.replay_mode:
                 try:
                     print(f"获取 {ts_code} 的实时行情...")
                     
-                    # 将ts_code转换为easyquotation使用的格式
-                    market_code = ts_code.split('.')
-                    if len(market_code) == 2:
-                        code = market_code[0]
-                        market = market_code[1].lower()
-                        easy_code = f"{market}{code}"
+                    if self.update_daily_quotes() and self.daily_quotes and ts_code in self.daily_quotes:
+                        real_time_quote = self.daily_quotes[ts_code]
+                        print(f"获取到实时行情: {real_time_quote}")
                         
-                        # 获取实时行情
-                        market_data = quotation.market_snapshot(prefix=True)
-                        
-                        if easy_code in market_data:
-                            real_time_quote = market_data[easy_code]
-                            print(f"获取到实时行情: {real_time_quote}")
-                            
-                            # 使用实时价格
-                            current_price = float(real_time_quote['now'])
-                            pre_close = float(real_time_quote['close'])
+                        # 使用实时价格
+                        current_price = float(real_time_quote['close'])
+                        pre_close = float(real_time_quote['pre_close'])
+                        stale = stale or self.quotes_stale
                             
                 except Exception as e:
                     print(f"获取实时行情失败: {e}，将使用历史数据")
@@ -541,14 +862,16 @@ class StockDataCache:
             result = {
                 'code': ts_code.split('.')[0],
                 'ts_code': ts_code,
-                'trade_date': current_date.strftime('%Y%m%d'),
+                'trade_date': (self.last_quote_update if self.replay_mode and self.last_quote_update
+                               else current_date).strftime('%Y%m%d'),
                 'close': current_price,
                 'pre_close': pre_close,
                 'change': change,
                 'pct_chg': pct_chg,
                 'multi_period_changes': multi_period_changes,  # 新增多期间涨跌幅
-                'data_type': 'realtime' if is_trading_time else 'historical',
-                'data_timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S')
+                'data_type': 'replay' if self.replay_mode else ('realtime' if is_trading_time else 'historical'),
+                'data_timestamp': current_date.strftime('%Y-%m-%d %H:%M:%S'),
+                'stale': stale  # 实时数据源不可用时为本地兜底的过期数据
             }
             
             print(f"获取 {ts_code} 行情成功，多期间涨跌幅: {multi_period_changes}")
@@ -560,21 +883,42 @@ class StockDataCache:
             traceback.print_exc()
             return None
     
-    def get_daily_data(self, ts_code, days=60):
-        """获取股票日K线数据 - 使用LRU缓存的新浪财经真实历史数据"""
+    def get_daily_data(self, ts_code, days=60, since=None, start_date=None, end_date=None,
+                       allow_stale=True):
+        """
+        获取股票日K线数据 - 使用按股票缓存的新浪财经真实历史数据
+        默认返回最近days条；指定start_date/end_date(YYYYMMDD)时返回该日期区间，
+        since为YYYYMMDD格式时只返回该日期及之后的K线。
+        allow_stale为True时可能返回过期数据（daily_data.attrs['stale']为True），同时在后台刷新
+        """
         try:
-            # 使用LRU缓存函数获取数据
-            daily_data_list = _fetch_daily_kline_data(ts_code, days)
+            # 从K线序列缓存中获取数据
+            if start_date:
+                series, stale = _get_kline_series(ts_code, start_date=start_date, allow_stale=allow_stale)
+            else:
+                series, stale = _get_kline_series(ts_code, days=days, allow_stale=allow_stale)
             
-            if daily_data_list is None:
+            if series is None:
                 return None
             
-            # 将字典列表转换为DataFrame
-            daily_data = pd.DataFrame(daily_data_list)
+            if start_date:
+                start = series.window_start(start_date=start_date)
+            else:
+                start = series.window_start(days=max(days, 0))
+            if since:
+                start = max(start, series.window_start(start_date=since))
+            end = max(series.window_end(end_date), start)
+            
+            # 将列式数组转换为DataFrame
+            daily_data = series.to_frame(start, end)
+            daily_data.attrs['stale'] = stale
+            daily_data.attrs['kline_version'] = series.version
             
             # 显示缓存状态和样本数据
-            cache_info = _fetch_daily_kline_data.cache_info()
-            print(f"[LRU缓存] 命中: {cache_info.hits}, 未命中: {cache_info.misses}, 当前大小: {cache_info.currsize}")
+            cache_info = get_daily_cache_info()
+            print(f"[K线缓存] 命中: {cache_info.hits}, 未命中: {cache_info.misses}, 淘汰: {cache_info.evictions}, "
+                  f"当前大小: {cache_info.currsize} ({cache_info.bytes_used / 1024 / 1024:.1f}/"
+                  f"{cache_info.max_bytes / 1024 / 1024:.0f} MB)")
             
             if len(daily_data) > 0:
                 latest = daily_data.iloc[-1]
@@ -588,6 +932,57 @@ class StockDataCache:
             traceback.print_exc()
             return None
     
+    def get_kline_series(self, ts_code, days=60, start_date=None):
+        """获取股票的K线列式序列(KlineSeries)，用于批量计算，失败返回None"""
+        try:
+            if start_date:
+                series, _ = _get_kline_series(ts_code, start_date=start_date, allow_stale=True)
+            else:
+                series, _ = _get_kline_series(ts_code, days=days, allow_stale=True)
+            return series
+        except Exception as e:
+            print(f"获取股票 {ts_code} K线序列失败: {e}")
+            return None
+    
+    def get_kline_series_many(self, ts_codes, days=60, start_date=None):
+        """并行获取多只股票的K线序列，返回与ts_codes顺序一致的列表（失败的为None）"""
+        if not ts_codes:
+            return []
+        with ThreadPoolExecutor(max_workers=KLINE_CACHE_CONFIG['fetch_workers']) as executor:
+            return list(executor.map(lambda ts_code: self.get_kline_series(ts_code, days, start_date),
+                                     ts_codes))
+    
+    def invalidate_daily_data(self, ts_codes, drop_store=False):
+        """使指定股票的K线缓存、由K线计算的行情结果及其已编码响应体失效"""
+        codes = set(ts_codes)
+        removed, deleted = invalidate_daily_cache(list(codes), drop_store)
+        quotes = sum(1 for ts_code in codes if self.quote_cache.pop(ts_code, None) is not None)
+        bodies = self.encoded_bodies.discard_where(
+            lambda key: isinstance(key, tuple) and key[0] == 'daily_data' and key[1] in codes)
+        return {'removed': removed, 'store_files_deleted': deleted, 'quotes_dropped': quotes,
+                'encoded_bodies_dropped': bodies}
+    
+    def warm_daily_data(self, ts_codes, days=60):
+        """
+        在后台预热多只股票的K线缓存
+        使用独立的预热线程池，不占用过期刷新、行情和提醒的后台线程；与它们共用按股票去重的任务表
+        """
+        submitted = 0
+        for ts_code in ts_codes:
+            if _refresher.submit_bulk(('kline', ts_code), _refresh_kline_series, ts_code, days):
+                submitted += 1
+        print(f"[缓存预热] 提交 {submitted} 只股票，{len(ts_codes) - submitted} 只已在刷新中")
+        return {'submitted': submitted, 'already_refreshing': len(ts_codes) - submitted}
+    
+    def daily_data_fingerprint(self, daily_data):
+        """
+        日K线数据指纹，用于判断已编码的响应体是否仍然有效
+        使用K线序列的版本号（任何一根K线被修正都会产生新版本），窗口参数已包含在响应体缓存键中
+        """
+        if daily_data is None:
+            return None
+        return (daily_data.attrs.get('kline_version'), len(daily_data))
+    
     def search_stocks(self, query, limit=10):
         """搜索股票"""
         if self.stock_list is None:
@@ -614,16 +1009,72 @@ class StockDataCache:
 
 
 # =============================================================================
-# LRU缓存管理函数
+# K线缓存管理函数
 # =============================================================================
 def get_daily_cache_info():
-    """获取日K线数据的LRU缓存信息"""
-    return _fetch_daily_kline_data.cache_info()
+    """获取日K线数据的缓存信息"""
+    stats = _kline_cache.stats()
+    return CacheInfo(stats['hits'], stats['misses'], stats['evictions'], stats['entries'],
+                     stats['bytes_used'], stats['max_bytes'])
+
+def get_daily_cache_stats():
+    """获取日K线缓存的详细统计（命中/未命中/淘汰次数、各分区字节占用）"""
+    return _kline_cache.stats()
+
+def get_background_refresh_stats():
+    """获取后台刷新线程池的提交、去重、失败次数"""
+    return _refresher.stats()
+
+def get_data_provider_stats():
+    """获取各数据源的健康统计（评分、成功率、延迟分位数、冷却状态）"""
+    return provider_pool.stats()
+
+def _describe_daily_cache_entry(item, now):
+    """将缓存条目统计转换为可序列化的字典，附带K线条数、日期范围和数据年龄"""
+    entry = item.pop('value')
+    series = entry.series
+    item['ts_code'] = item.pop('key')
+    item['bars'] = len(series)
+    item['first_date'] = int(series.first_date) if len(series) else None
+    item['last_date'] = int(series.last_date) if len(series) else None
+    item['complete'] = entry.complete
+    item['fetched_at'] = entry.fetched_at.strftime('%Y-%m-%d %H:%M:%S')
+    item['age_seconds'] = round((now - entry.fetched_at).total_seconds(), 1)
+    item['expired'] = _kline_entry_expired(entry, now)
+    return item
+
+def list_daily_cache_entries(sort_by='size', limit=None):
+    """列出已缓存的股票及其大小、数据年龄、命中次数，按sort_by（size/hits/age/frequency）降序"""
+    now = datetime.now()
+    entries = [_describe_daily_cache_entry(item, now) for item in _kline_cache.entries()]
+    sort_key = {'size': 'size', 'hits': 'hits', 'age': 'age_seconds', 'frequency': 'frequency'}.get(sort_by, 'size')
+    entries.sort(key=lambda item: item[sort_key], reverse=True)
+    return entries[:limit] if limit else entries
+
+def get_hot_daily_cache_keys(n=10):
+    """获取访问频率最高的n只已缓存股票"""
+    now = datetime.now()
+    return [_describe_daily_cache_entry(item, now) for item in _kline_cache.hot_keys(n)]
+
+def invalidate_daily_cache(ts_codes, drop_store=False):
+    """
+    使指定股票的K线缓存失效，返回(从内存移除的代码列表, 删除的存储文件数)
+    失效后下次请求从实时数据源完整回补，不再使用磁盘上的K线（用于修复错误K线）；
+    drop_store为True时同时删除磁盘存储。正在进行的刷新结果会被丢弃
+    """
+    with _kline_invalidate_lock:
+        for ts_code in ts_codes:
+            _kline_generations[ts_code] = _kline_generations.get(ts_code, 0) + 1
+            _kline_force_backfill.add(ts_code)
+        removed = _kline_cache.pop_many(ts_codes)
+        deleted = sum(1 for ts_code in ts_codes if kline_store.delete(ts_code)) if drop_store else 0
+    print(f"K线缓存失效: 内存移除 {len(removed)} 只，删除存储文件 {deleted} 个")
+    return removed, deleted
 
 def clear_daily_cache():
-    """清除日K线数据的LRU缓存"""
-    _fetch_daily_kline_data.cache_clear()
-    print("日K线数据LRU缓存已清空")
+    """清除日K线数据的内存缓存"""
+    _kline_cache.clear()
+    print("日K线数据缓存已清空")
 
 # =============================================================================
 # 创建全局缓存实例
@@ -636,4 +1087,10 @@ def create_stock_cache():
     if cache.stock_list is None:
         cache.update_stock_list()
     
+    # 从快照归档恢复当日行情，重启后无需等待上游
+    cache.restore_quote_snapshot()
+    
+    # 已保存的提醒规则需要在后台持续判断
+    cache.ensure_alert_poller()
+    
     return cache
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据批量导出模块
+按股票逐个从K线缓存/存储读取列数组，以生成器方式流式输出CSV或Parquet行组，
+缺失的股票在有限大小的线程窗口中并行获取，服务端内存占用与导出规模无关
+"""
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import numpy as np
+from kline_store import PRICE_SCALE
+
+# 可选依赖 - 未安装时只支持CSV导出
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_CONFIG = {
+    'fetch_workers': 8,         # 并行获取K线的线程数
+    'prefetch': 16,             # 最多提前获取的股票数量（限制内存占用）
+    'row_group_rows': 100000,   # Parquet每个行组的最大行数
+    'max_symbols': 6000         # 单次导出的股票数量上限
+}
+
+EXPORT_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close', 'vol']
+
+
+def iter_export_series(cache, ts_codes, days=None, start_date=None, end_date=None):
+    """
+    按ts_codes顺序依次返回(ts_code, 列字典)，每只股票只截取请求的日期区间
+    同时最多有prefetch只股票在获取或等待输出
+    """
+    def load(ts_code):
+        series = cache.get_kline_series(ts_code, days=days, start_date=start_date)
+        if series is None:
+            return None
+        if start_date:
+            start = series.window_start(start_date=start_date)
+        else:
+            start = series.window_start(days=days)
+        end = max(series.window_end(end_date), start)
+        window = series.bars[start:end]
+
+        close = window['close'] / PRICE_SCALE
+        pre_close = np.empty_like(close)
+        if len(window):
+            pre_close[1:] = close[:-1]
+            pre_close[0] = (series.bars['close'][start - 1] / PRICE_SCALE if start > 0
+                            else window['open'][0] / PRICE_SCALE)
+        return {
+            'trade_date': window['trade_date'],
+            'open': window['open'] / PRICE_SCALE,
+            'high': window['high'] / PRICE_SCALE,
+            'low': window['low'] / PRICE_SCALE,
+            'close': close,
+            'pre_close': pre_close,
+            'vol': window['vol']
+        }
+
+    with ThreadPoolExecutor(max_workers=EXPORT_CONFIG['fetch_workers']) as executor:
+        pending = deque()
+        codes = iter(ts_codes)
+        for ts_code in codes:
+            pending.append((ts_code, executor.submit(load, ts_code)))
+            if len(pending) >= EXPORT_CONFIG['prefetch']:
+                break
+
+        while pending:
+            ts_code, future = pending.popleft()
+            next_code = next(codes, None)
+            if next_code is not None:
+                pending.append((next_code, executor.submit(load, next_code)))
+
+            try:
+                columns = future.result()
+            except Exception as e:
+                print(f"导出 {ts_code} 失败: {e}")
+                columns = None
+            if columns is None:
+                print(f"导出时未获取到 {ts_code} 的数据，已跳过")
+                continue
+            yield ts_code, columns
+
+
+def iter_csv(cache, ts_codes, days=None, start_date=None, end_date=None):
+    """流式生成CSV文本块，每只股票一块"""
+    yield ','.join(EXPORT_COLUMNS) + '\n'
+    for ts_code, columns in iter_export_series(cache, ts_codes, days, start_date, end_date):
+        if len(columns['trade_date']) == 0:
+            continue
+        buffer = io.StringIO()
+        table = np.column_stack([
+            columns['trade_date'].astype(str),
+            np.char.mod('%.2f', columns['open']),
+            np.char.mod('%.2f', columns['high']),
+            np.char.mod('%.2f', columns['low']),
+            np.char.mod('%.2f', columns['close']),
+            np.char.mod('%.2f', columns['pre_close']),
+            columns['vol'].astype(str)
+        ])
+        for row in table:
+            buffer.write(ts_code)
+            buffer.write(',')
+            buffer.write(','.join(row))
+            buffer.write('\n')
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """收集ParquetWriter写出的字节，由生成器分块取走"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """取走已写出的字节"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(cache, ts_codes, days=None, start_date=None, end_date=None):
+    """流式生成Parquet文件字节，每累计row_group_rows行写出一个行组"""
+    if pq is None:
+        raise RuntimeError("未安装pyarrow，无法导出Parquet")
+
+    schema = pa.schema([
+        ('ts_code', pa.string()),
+        ('trade_date', pa.int32()),
+        ('open', pa.float64()),
+        ('high', pa.float64()),
+        ('low', pa.float64()),
+        ('close', pa.float64()),
+        ('pre_close', pa.float64()),
+        ('vol', pa.int64())
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    batches = []
+    rows = 0
+
+    def flush_row_group():
+        writer.write_table(pa.Table.from_batches(batches, schema=schema),
+                           row_group_size=EXPORT_CONFIG['row_group_rows'])
+        batches.clear()
+
+    for ts_code, columns in iter_export_series(cache, ts_codes, days, start_date, end_date):
+        count = len(columns['trade_date'])
+        if count == 0:
+            continue
+        arrays = [pa.array([ts_code] * count, type=pa.string())]
+        arrays += [pa.array(columns[name], type=schema.field(name).type) for name in EXPORT_COLUMNS[1:]]
+        batches.append(pa.record_batch(arrays, schema=schema))
+        rows += count
+
+        if rows >= EXPORT_CONFIG['row_group_rows']:
+            flush_row_group()
+            rows = 0
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+    if batches:
+        flush_row_group()
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
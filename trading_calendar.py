@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易日历模块
+预先计算交易时段边界(当日分钟数)，从本地文件加载交易所休市日，
+提供 is_open / next_open / last_close 等快速查询
+"""
+
+import os
+from datetime import datetime, time, timedelta
+
+
+def _clock_to_minutes(value):
+    """将 HH:MM 字符串转换为当日分钟数"""
+    hour, minute = value.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def _minutes_to_time(minutes):
+    """将当日分钟数转换为time对象"""
+    return time(minutes // 60, minutes % 60)
+
+
+def load_holidays(file_path):
+    """
+    从本地文件加载休市日
+    每行一个YYYYMMDD日期，#之后为注释；文件不存在时只按周末判断
+    """
+    holidays = set()
+    if not os.path.exists(file_path):
+        print(f"未找到休市日文件: {file_path}，仅按周末判断休市")
+        return holidays
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            value = line.split('#', 1)[0].strip()
+            if not value:
+                continue
+            try:
+                holidays.add(datetime.strptime(value, '%Y%m%d').date())
+            except ValueError:
+                print(f"休市日文件第{line_no}行格式无效: {value}")
+
+    if holidays:
+        print(f"加载休市日 {len(holidays)} 天 ({min(holidays).year}-{max(holidays).year}年): {file_path}")
+    return holidays
+
+
+class TradingCalendar:
+    """交易所交易日历"""
+
+    def __init__(self, sessions, holidays=None):
+        """
+        sessions: [(开始分钟, 结束分钟), ...]，按时间顺序排列
+        holidays: 休市日(date)集合，周末自动视为休市
+        """
+        self.sessions = tuple(sessions)
+        self.open_minute = self.sessions[0][0]
+        self.close_minute = self.sessions[-1][1]
+        self.open_time = _minutes_to_time(self.open_minute)
+        self.close_time = _minutes_to_time(self.close_minute)
+        self.holidays = frozenset(holidays or ())
+        # 休市日表覆盖的年份范围，超出范围的日期只能按周末判断
+        self.holiday_years = ((min(self.holidays).year, max(self.holidays).year)
+                              if self.holidays else None)
+        self._warned_years = set()
+
+    @classmethod
+    def from_config(cls, trading_time_config, holiday_file):
+        """根据交易时间配置和休市日文件创建日历"""
+        sessions = [
+            (_clock_to_minutes(trading_time_config['morning_start']),
+             _clock_to_minutes(trading_time_config['morning_end'])),
+            (_clock_to_minutes(trading_time_config['afternoon_start']),
+             _clock_to_minutes(trading_time_config['afternoon_end']))
+        ]
+        return cls(sessions, load_holidays(holiday_file))
+
+    def is_trading_day(self, day):
+        """判断某天是否为交易日"""
+        if isinstance(day, datetime):
+            day = day.date()
+        if self.holiday_years is not None and not (self.holiday_years[0] <= day.year <= self.holiday_years[1]):
+            self._warn_uncovered_year(day.year)
+        return day.weekday() < 5 and day not in self.holidays
+
+    def _warn_uncovered_year(self, year):
+        """休市日表未覆盖该年份时提示一次（该年的节假日会被当作交易日）"""
+        if year in self._warned_years:
+            return
+        self._warned_years.add(year)
+        print(f"警告: 休市日文件只覆盖 {self.holiday_years[0]}-{self.holiday_years[1]} 年，"
+              f"{year} 年的节假日将被视为交易日，请更新休市日文件")
+
+    def is_open(self, ts=None):
+        """
+        判断某一时刻是否处于交易时段内（包含开始时刻，不含结束时刻）
+        精确到秒比较，收盘时刻起last_close即返回当日收盘，两者保持一致
+        """
+        ts = ts or datetime.now()
+        if not self.is_trading_day(ts):
+            return False
+        second = ts.hour * 3600 + ts.minute * 60 + ts.second
+        for start, end in self.sessions:
+            if start * 60 <= second < end * 60:
+                return True
+        return False
+
+    def previous_trading_day(self, day):
+        """day之前(不含)最近的交易日"""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day):
+        """day之后(不含)最近的交易日"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def next_open(self, ts=None):
+        """ts之后(不含)最近一个交易时段的开始时间"""
+        ts = ts or datetime.now()
+        day = ts.date()
+        if self.is_trading_day(day):
+            minute = ts.hour * 60 + ts.minute
+            for start, _ in self.sessions:
+                if minute < start:
+                    return datetime.combine(day, _minutes_to_time(start))
+        return datetime.combine(self.next_trading_day(day), self.open_time)
+
+    def last_close(self, ts=None):
+        """ts之前(含)最近一个交易日的收盘时间"""
+        ts = ts or datetime.now()
+        day = ts.date()
+        if self.is_trading_day(day) and ts.time() >= self.close_time:
+            return datetime.combine(day, self.close_time)
+        return datetime.combine(self.previous_trading_day(day), self.close_time)